@@ -0,0 +1,126 @@
+import time
+import random
+import threading
+from contextlib import contextmanager
+
+from dropbox.exceptions import RateLimitError
+from drive_ops import rate_limit_retry_after
+from dropbox_ops import DEFAULT_RATE_LIMIT_BACKOFF
+
+# --- CONFIGURATION ---
+DEFAULT_INITIAL_LIMIT = 8
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 64
+DECREASE_FACTOR = 0.5        # Multiplicative decrease on a rate-limit response
+
+
+def rate_limit_delay(error):
+    """
+    Seconds the service asked us to wait if `error` is a rate-limit response, else None.
+    - Dropbox: RateLimitError.backoff (Retry-After)
+    - Drive:   429 / 403 rateLimitExceeded, Retry-After header when present
+    """
+    if isinstance(error, RateLimitError):
+        return error.backoff if error.backoff is not None else DEFAULT_RATE_LIMIT_BACKOFF
+    return rate_limit_retry_after(error)
+
+def retry_delay(attempt, error):
+    """Wait before retry `attempt`: exactly the Retry-After for rate limits, else the usual linear backoff."""
+    delay = rate_limit_delay(error)
+    if delay is not None:
+        return delay
+    return (attempt * 2) + random.uniform(0.1, 1.0)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on the number of transfers in flight, shared by all worker threads.
+
+    - Additive increase: every success adds 1/limit, so the limit grows by about
+      one per round of `limit` successful transfers.
+    - Multiplicative decrease: a rate-limit response halves the limit (once per
+      pause, so a burst of 429s from the same moment counts as one event).
+    - Retry-After: nobody starts a new transfer until the longest requested pause is over.
+
+    Worker threads wrap each transfer attempt in slot() and report the outcome.
+    The thread count is only the ceiling; `limit` is what actually runs.
+    """
+
+    def __init__(self, initial=DEFAULT_INITIAL_LIMIT, min_limit=DEFAULT_MIN_LIMIT,
+                 max_limit=DEFAULT_MAX_LIMIT, decrease=DECREASE_FACTOR):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.limit = float(max(min_limit, min(initial, max_limit)))
+        self.rate_limited = 0          # Rate-limit responses seen
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    # ==========================================
+    # 1. SLOTS
+    # ==========================================
+
+    def acquire(self):
+        """Blocks until a slot is free and no Retry-After pause is running."""
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._in_flight < int(self.limit):
+                    self._in_flight += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def release(self):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    # ==========================================
+    # 2. FEEDBACK
+    # ==========================================
+
+    def on_success(self):
+        with self._cond:
+            if self.limit < self.max_limit:
+                previous = int(self.limit)
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+                if int(self.limit) > previous:
+                    self._cond.notify_all()
+
+    def on_rate_limit(self, seconds):
+        """Cuts the limit and pauses new transfers for `seconds` (the service's Retry-After)."""
+        with self._cond:
+            self.rate_limited += 1
+            now = time.time()
+            # Already paused: these are the other in-flight requests of the same burst
+            if now >= self._paused_until:
+                previous = self.limit
+                self.limit = max(self.min_limit, self.limit * self.decrease)
+                print(f"[Concurrency] Rate limited: {int(previous)} -> {int(self.limit)} in flight, pausing {seconds:.1f}s")
+            self._paused_until = max(self._paused_until, now + seconds)
+
+    def report(self, error):
+        """
+        Feeds one failed attempt to the controller.
+        Returns the Retry-After to sleep for rate limits, or None for any other error.
+        """
+        delay = rate_limit_delay(error)
+        if delay is not None:
+            self.on_rate_limit(delay)
+        return delay
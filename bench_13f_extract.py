@@ -0,0 +1,100 @@
+import sys
+import json
+import time
+import random
+import pandas as pd
+
+from f13_extract import loads, get_recent, count_13f, extract_13f_columns
+
+# --- CONFIGURATION ---
+ROWS = 1000          # filings.recent holds up to 1000 entries
+REPEATS = 200
+FORMS = ["13F-HR", "13F-HR/A", "13F-NT", "4", "3", "SC 13G", "SC 13G/A", "8-K", "10-Q", "D"]
+
+
+def make_sample(rows=ROWS, seed=13):
+    """Synthetic submissions JSON with the same 14 parallel arrays SEC returns."""
+    rng = random.Random(seed)
+    recent = {
+        "accessionNumber": [f"0001234567-{rng.randint(0, 25):02d}-{i:06d}" for i in range(rows)],
+        "filingDate": [f"20{rng.randint(0, 25):02d}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}" for _ in range(rows)],
+        "reportDate": ["2024-06-30" for _ in range(rows)],
+        "acceptanceDateTime": ["2024-08-14T16:05:31.000Z" for _ in range(rows)],
+        "act": ["34" for _ in range(rows)],
+        "form": [rng.choice(FORMS) for _ in range(rows)],
+        "fileNumber": ["028-12345" for _ in range(rows)],
+        "filmNumber": [str(24000000 + i) for i in range(rows)],
+        "items": ["" for _ in range(rows)],
+        "core_type": ["13F-HR" for _ in range(rows)],
+        "size": [rng.randint(2000, 900000) for _ in range(rows)],
+        "isXBRL": [0 for _ in range(rows)],
+        "isInlineXBRL": [0 for _ in range(rows)],
+        "primaryDocument": ["primary_doc.xml" for _ in range(rows)],
+        "primaryDocDescription": ["" for _ in range(rows)],
+    }
+    return json.dumps({"cik": "1234567", "name": "SAMPLE CAPITAL LLC", "filings": {"recent": recent, "files": []}}).encode()
+
+
+# ==========================================
+# OLD PATH (what process_cik_item used to do)
+# ==========================================
+
+def dataframe_count(body):
+    form_result = json.loads(body)
+    df_forms = pd.DataFrame(form_result['filings']['recent'])
+    return int(df_forms['form'].str.contains('13F', na=False).sum())
+
+def dataframe_table(body):
+    form_result = json.loads(body)
+    df_all = pd.DataFrame(form_result['filings']['recent'])
+    return df_all[df_all['form'].str.contains('13F', na=False)].copy()
+
+
+# ==========================================
+# NEW PATH (f13_extract)
+# ==========================================
+
+def columnar_count(body):
+    return count_13f(loads(body))
+
+def columnar_table(body):
+    return pd.DataFrame(extract_13f_columns(get_recent(loads(body))))
+
+
+def bench(label, func, body, repeats=REPEATS):
+    func(body)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func(body)
+    per_call = (time.perf_counter() - start) / repeats * 1e6
+    print(f"  {label:<28} {per_call:10.1f} us/call")
+    return per_call
+
+def main():
+    # Optional: benchmark a real submissions file instead of the synthetic one
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], 'rb') as f:
+            body = f.read()
+    else:
+        body = make_sample()
+
+    # Both paths must agree before timing means anything
+    assert dataframe_count(body) == columnar_count(body)
+    assert dataframe_table(body).reset_index(drop=True).equals(columnar_table(body))
+
+    print(f"Payload: {len(body) / 1024:.0f} KB, 13F rows: {columnar_count(body)}")
+    print("\nCount mode (process_cik_chunk.py)")
+    old = bench("DataFrame + str.contains", dataframe_count, body)
+    new = bench("columnar scan", columnar_count, body)
+    print(f"  speed-up: {old / new:.1f}x")
+
+    print("\nTable mode (run_updated_table.py)")
+    old = bench("DataFrame + filter", dataframe_table, body)
+    new = bench("columnar gather", columnar_table, body)
+    print(f"  speed-up: {old / new:.1f}x")
+
+if __name__ == "__main__":
+    main()
+
+# python bench_13f_extract.py
+# python bench_13f_extract.py CIK0001463262.json
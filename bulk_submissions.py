@@ -0,0 +1,277 @@
+import os
+import re
+import json
+import time
+import zipfile
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from f13_extract import loads
+from sec_history import select_history_pages, build_13f_table
+from forms_table_writer import PartitionedTableWriter
+from process_cik_chunk import summarize_submissions, save_results
+from run_updated_table import dataframe_to_csv_bytes, upload_csv_bytes_to_dropbox, get_dbx_handler
+
+# --- CONFIGURATION ---
+# Nightly archive: https://www.sec.gov/Archives/edgar/daily-index/bulkdata/submissions.zip
+DEFAULT_ZIP = "submissions.zip"
+BATCH_SIZE = 500          # CIKs per pool task
+MAX_WORKERS = os.cpu_count() or 4
+LOCAL_TABLE_FOLDER = "forms_table"
+
+# CIK0001234567.json or CIK0001234567-submissions-001.json
+MEMBER_PATTERN = re.compile(r"^CIK(\d{10})(?:-submissions-\d+)?\.json$")
+
+# --- PER-PROCESS STATE (set by _init_worker) ---
+_ZIP = None
+_OPTIONS = None
+
+
+# ==========================================
+# 1. ARCHIVE INDEX
+# ==========================================
+
+def index_members(zip_path):
+    """
+    Groups zip members by padded CIK:
+        {'0001234567': {'main': 'CIK0001234567.json', 'pages': {'CIK...-001.json', ...}}}
+    Only the central directory is read; nothing is extracted.
+    """
+    members = {}
+    with zipfile.ZipFile(zip_path) as zf:
+        for name in zf.namelist():
+            match = MEMBER_PATTERN.match(os.path.basename(name))
+            if not match:
+                continue
+            entry = members.setdefault(match.group(1), {"main": None, "pages": {}})
+            if "-submissions-" in name:
+                entry["pages"][os.path.basename(name)] = name
+            else:
+                entry["main"] = name
+    return members
+
+
+# ==========================================
+# 2. WORKERS (one ZipFile handle per process)
+# ==========================================
+
+def _init_worker(zip_path, options):
+    global _ZIP, _OPTIONS
+    _ZIP = zipfile.ZipFile(zip_path)
+    _OPTIONS = options
+
+def _read_history_pages(form_result, entry, date_from, date_to):
+    """
+    Same page selection as the HTTP path, read from the archive instead.
+    Raises ValueError if a selected page is missing from the archive.
+    """
+    history_pages = []
+    for page in select_history_pages(form_result, date_from, date_to):
+        member = entry["pages"].get(page["name"])
+        if member is None:
+            raise ValueError(f"History page {page['name']} not in submissions.zip")
+        history_pages.append(loads(_ZIP.read(member)))
+    return history_pages
+
+def _process_batch(batch):
+    """
+    batch: list of (item, members_entry). Each member is decompressed straight
+    from the archive into memory. Returns a list of (ok, record, payload),
+    where payload is CSV bytes, a DataFrame (parquet output) or None.
+    """
+    results = []
+    for item, entry in batch:
+        try:
+            form_result = loads(_ZIP.read(entry["main"]))
+        except Exception as e:
+            results.append((False, {"name": item.get('name'), "cik": item.get('cik'), "error": str(e)}, None))
+            continue
+
+        if _OPTIONS["mode"] == "count":
+            results.append((True, summarize_submissions(item, form_result), None))
+            continue
+
+        history_pages = []
+        date_from = date_to = None
+        if _OPTIONS["full_history"]:
+            date_from, date_to = _OPTIONS["date_from"], _OPTIONS["date_to"]
+            try:
+                history_pages = _read_history_pages(form_result, entry, date_from, date_to)
+            except Exception as e:
+                # Same rule as the HTTP path: no table with a silent gap in the middle
+                results.append((False, {"name": item.get('name'), "cik": item.get('cik'), "error": str(e)}, None))
+                continue
+
+        df_13f = build_13f_table(form_result, history_pages, date_from, date_to)
+        cik_padded = str(int(item.get('cik'))).zfill(10)
+        record = {
+            "name": item.get('name', 'Unknown'),
+            "cik": cik_padded,
+            "13f_count": len(df_13f),
+            "status": "success + no_13f_found",
+        }
+        if df_13f.empty:
+            payload = None
+        elif _OPTIONS["output_format"] == "parquet":
+            # Typed rows go back to the parent, which owns the partitioned writer
+            payload = df_13f
+        else:
+            payload = dataframe_to_csv_bytes(df_13f)
+        results.append((True, record, payload))
+
+    return results
+
+
+# ==========================================
+# 3. DRIVER
+# ==========================================
+
+def load_items(input_path):
+    """Optional CIK list: a cik_parser chunk JSON or a CSV with a 'cik' column."""
+    from sec_async_fetcher import load_cik_items
+    return load_cik_items(input_path)
+
+def run_bulk(zip_path, items, mode, full_history=False, date_from=None, date_to=None,
+             upload=False, local_folder=LOCAL_TABLE_FOLDER, max_workers=MAX_WORKERS, table_writer=None):
+    """
+    Runs the 13F count/extract logic for every item across a process pool.
+    table_writer: optional PartitionedTableWriter (table mode, --output-format parquet).
+    Returns (success_list, failed_list), each in the same order as `items`
+    (CIKs rejected before the pool runs are merged back into their input position).
+    """
+    print(f"Indexing {zip_path}...")
+    members = index_members(zip_path)
+    print(f"Archive holds {len(members)} CIKs.")
+
+    if items is None:
+        # Whole archive: no lookup names available, so use the filer name later
+        items = [{"name": None, "cik": cik} for cik in sorted(members)]
+
+    tasks = []
+    positions = []     # Input position of every task, to merge the failures back in order
+    failed = []        # (position, record)
+    for pos, item in enumerate(items):
+        try:
+            cik_padded = str(int(item.get('cik'))).zfill(10)
+        except (TypeError, ValueError):
+            failed.append((pos, {"name": item.get('name'), "cik": item.get('cik'), "error": "Invalid CIK"}))
+            continue
+        entry = members.get(cik_padded)
+        if not entry or not entry["main"]:
+            failed.append((pos, {"name": item.get('name'), "cik": item.get('cik'), "error": "Not in submissions.zip"}))
+            continue
+        tasks.append((item, entry))
+        positions.append(pos)
+
+    batches = [tasks[i : i + BATCH_SIZE] for i in range(0, len(tasks), BATCH_SIZE)]
+    options = {"mode": mode, "full_history": full_history, "date_from": date_from, "date_to": date_to,
+               "output_format": "parquet" if table_writer is not None else "csv"}
+
+    if mode == "table" and table_writer is None:
+        if upload:
+            get_dbx_handler()
+        else:
+            os.makedirs(local_folder, exist_ok=True)
+
+    success_list = []
+    start_time = time.time()
+    done = 0
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(zip_path, options)) as executor:
+        # map() keeps batch order, so the output order matches the input list
+        task_positions = iter(positions)
+        for batch_results in executor.map(_process_batch, batches):
+            for (ok, record, payload), pos in zip(batch_results, task_positions):
+                if not ok:
+                    failed.append((pos, record))
+                    continue
+
+                if mode == "count" and record.get("name") is None:
+                    record["name"] = record.get("filer_name")
+
+                if payload is not None and table_writer is not None:
+                    table_writer.add(record["cik"], payload)
+                    record["status"] = "success + parquet"
+                elif payload is not None:
+                    csv_bytes = payload
+                    if upload:
+                        uploaded = upload_csv_bytes_to_dropbox(csv_bytes, record["cik"])
+                        record["status"] = "success + uploaded" if uploaded else "success + upload_failed"
+                    else:
+                        with open(os.path.join(local_folder, f"{record['cik']}.csv"), 'wb') as f:
+                            f.write(csv_bytes)
+                        record["status"] = "success + saved"
+
+                success_list.append(record)
+
+            done += 1
+            elapsed = max(time.time() - start_time, 1e-6)
+            print(f"Progress: batch {done}/{len(batches)} | Success: {len(success_list)} "
+                  f"| Failed: {len(failed)} | {len(success_list) / elapsed:.0f} CIK/s")
+
+    failed_list = [record for _, record in sorted(failed, key=lambda pair: pair[0])]
+    return success_list, failed_list
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the 13F count/extract logic over a local submissions.zip.")
+    parser.add_argument("--zip", default=DEFAULT_ZIP, help="Path to the downloaded submissions.zip")
+    parser.add_argument("--input", default=None,
+                        help="Optional CIK list (cik_chunks/cik_data_part_N.json or a CSV with a 'cik' column)")
+    parser.add_argument("--mode", choices=["count", "table"], default="count")
+    parser.add_argument("--full-history", action="store_true", help="Table mode: include the archived history pages")
+    parser.add_argument("--date-from", default=None, help="With --full-history: only 13F filings on/after this date")
+    parser.add_argument("--date-to", default=None, help="With --full-history: only 13F filings on/before this date")
+    parser.add_argument("--upload", action="store_true",
+                        help="Table mode: upload to Dropbox instead of writing forms_table/{cik}.csv locally")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                        help="Table mode: csv = one file per CIK, parquet = partitioned files + manifest")
+    parser.add_argument("--partition-by", choices=["bucket", "year"], default="bucket")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.zip):
+        print(f"File {args.zip} not found.")
+        return
+
+    items = load_items(args.input) if args.input else None
+
+    # Same output naming as process_cik_chunk.py / run_updated_table.py
+    if args.input:
+        base_name = os.path.splitext(os.path.basename(args.input))[0]
+    else:
+        base_name = "cik_data_part_bulk"
+    if args.mode == "count":
+        part_number = base_name.replace("cik_data_part_", "")
+        os.makedirs("cik_chunks", exist_ok=True)
+        output_success = f"cik_chunks/cik_update_part_{part_number}.json"
+        output_failed = f"cik_chunks/failed_part_{part_number}.json"
+    else:
+        output_success = f"{base_name}_results.json"
+        output_failed = f"{base_name}_failed.json"
+
+    table_writer = None
+    if args.mode == "table" and args.output_format == "parquet":
+        table_writer = PartitionedTableWriter(partition_by=args.partition_by)
+
+    start_time = time.time()
+    success_list, failed_list = run_bulk(
+        args.zip, items, args.mode, args.full_history, args.date_from, args.date_to,
+        upload=args.upload, max_workers=args.workers, table_writer=table_writer
+    )
+
+    if table_writer is not None:
+        table_writer.close()
+        if args.upload:
+            table_writer.upload(get_dbx_handler())
+    save_results(success_list, failed_list, output_success, output_failed)
+
+    duration = int(time.time() - start_time)
+    print(f"Finished. {len(success_list)} CIKs in {duration // 60}m {duration % 60}s. Results: {output_success}")
+
+if __name__ == "__main__":
+    main()
+
+# python bulk_submissions.py --zip submissions.zip --input cik_chunks/cik_data_part_1.json
+# python bulk_submissions.py --zip submissions.zip --input cik_to_run.csv --mode table --upload
+# python bulk_submissions.py --zip submissions.zip --mode table --output-format parquet
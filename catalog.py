@@ -0,0 +1,419 @@
+import os
+import csv
+import glob
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+# --- CONFIGURATION ---
+DEFAULT_CATALOG_PATH = os.environ.get("CATALOG_PATH", "catalog.sqlite")
+BUSY_TIMEOUT_SECONDS = 30     # Other processes may be writing (WAL allows one writer at a time)
+
+# Files the catalog replaces; `python catalog.py import` loads whichever exist
+DRIVE_FILES_CSV = "drive_files.csv"
+DROPBOX_FILES_CSVS = ["my_dropbox_files.csv", "sec_forms_report.csv"]
+MIGRATION_FAILED_CSV = "migration_failed.csv"
+CIK_TO_RUN_CSV = "cik_to_run.csv"             # name, cik, filer_name, 13f_rows, status
+CIK_RESULT_GLOBS = ["cik_chunks/cik_update_part_*.json", "*_results.json"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS drive_files (
+    fid           TEXT PRIMARY KEY,
+    folder_name   TEXT NOT NULL,
+    file_name     TEXT NOT NULL,
+    cik           TEXT,
+    acsn          TEXT,
+    size_bytes    INTEGER,
+    modified_time TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_drive_folder_file ON drive_files (folder_name, file_name);
+CREATE INDEX IF NOT EXISTS idx_drive_cik ON drive_files (cik);
+CREATE INDEX IF NOT EXISTS idx_drive_acsn ON drive_files (acsn);
+
+CREATE TABLE IF NOT EXISTS dropbox_files (
+    path_lower      TEXT PRIMARY KEY,
+    folder_name     TEXT NOT NULL,
+    file_name       TEXT NOT NULL,
+    path_display    TEXT,
+    cik             TEXT,
+    acsn            TEXT,
+    size_bytes      INTEGER,
+    server_modified TEXT,
+    content_hash    TEXT,
+    id              TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_dropbox_folder_file ON dropbox_files (folder_name, file_name);
+CREATE INDEX IF NOT EXISTS idx_dropbox_cik ON dropbox_files (cik);
+CREATE INDEX IF NOT EXISTS idx_dropbox_acsn ON dropbox_files (acsn);
+
+CREATE TABLE IF NOT EXISTS migration_state (
+    fid         TEXT PRIMARY KEY,
+    folder_name TEXT NOT NULL,
+    file_name   TEXT NOT NULL,
+    target_path TEXT,
+    state       TEXT NOT NULL,
+    attempts    INTEGER NOT NULL DEFAULT 0,
+    last_error  TEXT,
+    updated_at  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_migration_state ON migration_state (state);
+CREATE INDEX IF NOT EXISTS idx_migration_folder ON migration_state (folder_name);
+
+CREATE TABLE IF NOT EXISTS cik_results (
+    cik        TEXT PRIMARY KEY,
+    name       TEXT,
+    filer_name TEXT,
+    f13_count  INTEGER,
+    status     TEXT,
+    error      TEXT,
+    source     TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_cik_results_status ON cik_results (status);
+"""
+
+
+def parse_form_file_name(file_name):
+    """
+    '0001162170_0001162170_02_000005_2001_12_31.parquet'
+        -> ('0001162170', '0001162170-02-000005')   (cik, accession number)
+    Returns (None, None) for names that do not follow the pattern.
+    """
+    parts = os.path.splitext(file_name)[0].split("_")
+    if len(parts) < 4 or not (parts[0].isdigit() and parts[1].isdigit()):
+        return None, None
+    return parts[0], f"{parts[1]}-{parts[2]}-{parts[3]}"
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Catalog:
+    """
+    One local SQLite file (WAL mode) holding the state the scripts used to keep in CSV/JSON:
+    Drive files, Dropbox files, per-file migration state and per-CIK fetch results.
+
+    Writes are bulk (executemany in one transaction); reads are indexed queries.
+    Safe to share between threads; several processes can use the same file.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _write_many(self, sql, rows, clear=None):
+        """clear: optional (sql, params) run first in the same transaction, e.g. a DELETE for a full replace."""
+        rows = list(rows)
+        if not rows and clear is None:
+            return 0
+        with self._lock, self.conn:
+            if clear is not None:
+                self.conn.execute(*clear)
+            self.conn.executemany(sql, rows)
+        return len(rows)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    # ==========================================
+    # 1. BULK UPSERTS
+    # ==========================================
+
+    def upsert_drive_files(self, rows, clear=None):
+        """
+        rows: dicts with folder_name, file_name, fid (+ optional cik, acsn, size_bytes, modified_time).
+        clear: see _write_many.
+        """
+        def values():
+            for row in rows:
+                cik, acsn = row.get('cik'), row.get('acsn')
+                if not cik or not acsn:
+                    cik, acsn = parse_form_file_name(row['file_name'])
+                yield (row['fid'], row['folder_name'], row['file_name'], cik, acsn,
+                       _int_or_none(row.get('size_bytes')), row.get('modified_time'))
+
+        return self._write_many("""
+            INSERT INTO drive_files (fid, folder_name, file_name, cik, acsn, size_bytes, modified_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fid) DO UPDATE SET
+                folder_name=excluded.folder_name, file_name=excluded.file_name, cik=excluded.cik,
+                acsn=excluded.acsn, size_bytes=excluded.size_bytes, modified_time=excluded.modified_time
+        """, values(), clear)
+
+    def replace_drive_files(self, rows):
+        """Makes `rows` (a complete Drive listing) the whole drive_files table, in one transaction."""
+        return self.upsert_drive_files(rows, clear=("DELETE FROM drive_files", ()))
+
+    def upsert_dropbox_files(self, records, clear=None):
+        """
+        records: DropboxManager file records (folder_name, file_name, path_display, size_bytes, ...).
+        clear: see _write_many.
+        """
+        def values():
+            for record in records:
+                cik, acsn = parse_form_file_name(record['file_name'])
+                yield (record['path_display'].lower(), record['folder_name'], record['file_name'],
+                       record['path_display'], cik, acsn, _int_or_none(record.get('size_bytes')),
+                       record.get('server_modified'), record.get('content_hash'), record.get('id'))
+
+        return self._write_many("""
+            INSERT INTO dropbox_files (path_lower, folder_name, file_name, path_display, cik, acsn,
+                                       size_bytes, server_modified, content_hash, id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path_lower) DO UPDATE SET
+                folder_name=excluded.folder_name, file_name=excluded.file_name,
+                path_display=excluded.path_display, cik=excluded.cik, acsn=excluded.acsn,
+                size_bytes=excluded.size_bytes, server_modified=excluded.server_modified,
+                content_hash=COALESCE(excluded.content_hash, dropbox_files.content_hash), id=excluded.id
+        """, values(), clear)
+
+    def delete_dropbox_files(self, paths):
+        return self._write_many("DELETE FROM dropbox_files WHERE path_lower = ?", ((p.lower(),) for p in paths))
+
+    def replace_dropbox_folder(self, root_path, records):
+        """
+        Drops everything under `root_path` and inserts `records` (used after a full listing).
+        One transaction, so readers never see the folder empty or half filled.
+        """
+        prefix = root_path.lower().rstrip("/") + "/"
+        # '0' sorts right after '/', so this range is exactly "starts with prefix" and uses the index
+        clear = ("DELETE FROM dropbox_files WHERE path_lower >= ? AND path_lower < ?", (prefix, prefix[:-1] + "0"))
+        return self.upsert_dropbox_files(records, clear=clear)
+
+    def count_dropbox_files(self, root_path):
+        prefix = root_path.lower().rstrip("/") + "/"
+        return self._query("SELECT COUNT(*) AS n FROM dropbox_files WHERE path_lower >= ? AND path_lower < ?",
+                           (prefix, prefix[:-1] + "0"))[0]["n"]
+
+    def set_migration_state(self, rows, state, error=None):
+        """
+        rows: dicts with fid, folder_name, file_name (+ optional target_path, error_reason).
+        'failed' increments the attempt counter; the row's own error_reason wins over `error`.
+        'done' clears last_error.
+        """
+        now = time.time()
+        failed = 1 if state == "failed" else 0
+
+        def values():
+            for row in rows:
+                yield (row['fid'], row['folder_name'], row['file_name'], row.get('target_path'), state,
+                       failed, row.get('error_reason') or error, now)
+
+        return self._write_many("""
+            INSERT INTO migration_state (fid, folder_name, file_name, target_path, state, attempts, last_error, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fid) DO UPDATE SET
+                state=excluded.state, attempts=migration_state.attempts + excluded.attempts,
+                target_path=COALESCE(excluded.target_path, migration_state.target_path),
+                last_error=CASE WHEN excluded.state = 'done' THEN NULL
+                                ELSE COALESCE(excluded.last_error, migration_state.last_error) END,
+                updated_at=excluded.updated_at
+        """, values())
+
+    def upsert_cik_results(self, records, source=None):
+        """records: process_cik_chunk / run_updated_table success or failure dicts."""
+        now = time.time()
+
+        def values():
+            for record in records:
+                cik = record.get('cik')
+                if cik is None:
+                    continue
+                try:
+                    cik = str(int(cik)).zfill(10)
+                except (TypeError, ValueError):
+                    continue
+                count = record.get('13f_rows', record.get('13f_count'))
+                status = record.get('status') or ("failed" if record.get('error') else None)
+                yield (cik, record.get('name'), record.get('filer_name'), _int_or_none(count),
+                       status, record.get('error'), source, now)
+
+        return self._write_many("""
+            INSERT INTO cik_results (cik, name, filer_name, f13_count, status, error, source, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(cik) DO UPDATE SET
+                name=COALESCE(excluded.name, cik_results.name),
+                filer_name=COALESCE(excluded.filer_name, cik_results.filer_name),
+                f13_count=excluded.f13_count, status=excluded.status, error=excluded.error,
+                source=excluded.source, updated_at=excluded.updated_at
+        """, values())
+
+    # ==========================================
+    # 2. QUERIES
+    # ==========================================
+
+    def missing_in_dropbox(self, folder_name=None):
+        """Drive files with no Dropbox file of the same folder/name (optionally for one quarter folder)."""
+        sql = """
+            SELECT d.folder_name, d.file_name, d.cik, d.acsn, d.fid, d.size_bytes
+            FROM drive_files d
+            WHERE NOT EXISTS (SELECT 1 FROM dropbox_files x
+                              WHERE x.folder_name = d.folder_name AND x.file_name = d.file_name)
+        """
+        params = ()
+        if folder_name:
+            sql += " AND d.folder_name = ?"
+            params = (folder_name,)
+        return self._query(sql + " ORDER BY d.folder_name, d.file_name", params)
+
+    def folder_summary(self):
+        """Per quarter folder: files in Drive, files in Dropbox, failed migrations."""
+        return self._query("""
+            SELECT f.folder_name,
+                   (SELECT COUNT(*) FROM drive_files d WHERE d.folder_name = f.folder_name) AS drive_files,
+                   (SELECT COUNT(*) FROM dropbox_files x WHERE x.folder_name = f.folder_name) AS dropbox_files,
+                   (SELECT COUNT(*) FROM migration_state m
+                     WHERE m.folder_name = f.folder_name AND m.state = 'failed') AS failed
+            FROM (SELECT folder_name FROM drive_files UNION SELECT folder_name FROM dropbox_files) f
+            ORDER BY f.folder_name
+        """)
+
+    def files_for_cik(self, cik):
+        cik_padded = str(int(cik)).zfill(10)
+        return {
+            "drive": self._query("SELECT * FROM drive_files WHERE cik = ? ORDER BY folder_name", (cik_padded,)),
+            "dropbox": self._query("SELECT * FROM dropbox_files WHERE cik = ? ORDER BY folder_name", (cik_padded,)),
+            "result": self._query("SELECT * FROM cik_results WHERE cik = ?", (cik_padded,)),
+        }
+
+    def migration_rows(self, states, folder_name=None, max_attempts=None, in_flight_before=None):
+        """
+        migration_state rows in any of `states` (optionally one folder, fewer than `max_attempts` failures),
+        plus the file's size_bytes from drive_files (NULL if the listing never saw it).
+        in_flight_before: timestamp; 'in_flight' rows updated since then (a transfer that may
+        still be running in another process) are left out.
+        """
+        sql = f"""
+            SELECT m.*, d.size_bytes
+            FROM migration_state m LEFT JOIN drive_files d ON d.fid = m.fid
+            WHERE m.state IN ({','.join('?' * len(states))})
+        """
+        params = list(states)
+        if folder_name:
+            sql += " AND m.folder_name = ?"
+            params.append(folder_name)
+        if max_attempts is not None:
+            sql += " AND m.attempts < ?"
+            params.append(max_attempts)
+        if in_flight_before is not None:
+            sql += " AND (m.state != 'in_flight' OR m.updated_at < ?)"
+            params.append(in_flight_before)
+        return self._query(sql + " ORDER BY m.folder_name, m.file_name", params)
+
+    def migration_states_for(self, fids):
+        """{fid: state} for the given fids; fids with no recorded state are left out."""
+        fids = list(fids)
+        states = {}
+        for i in range(0, len(fids), 500):
+            chunk = fids[i : i + 500]
+            sql = f"SELECT fid, state FROM migration_state WHERE fid IN ({','.join('?' * len(chunk))})"
+            states.update((row["fid"], row["state"]) for row in self._query(sql, chunk))
+        return states
+
+    def migration_counts(self):
+        return {row["state"]: row["n"] for row in
+                self._query("SELECT state, COUNT(*) AS n FROM migration_state GROUP BY state")}
+
+
+# ==========================================
+# 3. IMPORT OF THE EXISTING FILES
+# ==========================================
+
+def _read_csv(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+def import_existing(catalog):
+    """Loads every legacy CSV/JSON state file that exists in the working directory."""
+    if os.path.exists(DRIVE_FILES_CSV):
+        print(f"{DRIVE_FILES_CSV}: {catalog.upsert_drive_files(_read_csv(DRIVE_FILES_CSV))} rows")
+
+    for path in DROPBOX_FILES_CSVS:
+        if os.path.exists(path):
+            rows = [row for row in _read_csv(path) if row.get('path_display')]
+            for row in rows:
+                if not row.get('folder_name'):
+                    parts = row['path_display'].split('/')
+                    row['folder_name'] = parts[-2] if len(parts) > 1 else ""
+            print(f"{path}: {catalog.upsert_dropbox_files(rows)} rows")
+
+    if os.path.exists(MIGRATION_FAILED_CSV):
+        print(f"{MIGRATION_FAILED_CSV}: {catalog.set_migration_state(_read_csv(MIGRATION_FAILED_CSV), 'failed')} rows")
+
+    # Before the JSON results, so the per-chunk outputs (newer) win for the same CIK
+    if os.path.exists(CIK_TO_RUN_CSV):
+        # Blank cells (CIKs not run yet) must not overwrite what the catalog already knows
+        records = [{key: value or None for key, value in row.items()} for row in _read_csv(CIK_TO_RUN_CSV)]
+        print(f"{CIK_TO_RUN_CSV}: {catalog.upsert_cik_results(records, source=CIK_TO_RUN_CSV)} rows")
+
+    for pattern in CIK_RESULT_GLOBS:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'r', encoding='utf-8') as f:
+                try:
+                    records = json.load(f)
+                except ValueError:
+                    continue
+            if isinstance(records, list):
+                print(f"{path}: {catalog.upsert_cik_results(records, source=os.path.basename(path))} rows")
+
+
+# ==========================================
+# 4. CLI
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SQLite catalog of Drive/Dropbox files, migrations and CIK results.")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("import", help="Load the existing CSV/JSON state files")
+    sub.add_parser("summary", help="Per-folder Drive vs Dropbox counts")
+    missing = sub.add_parser("missing", help="Drive files not yet in Dropbox")
+    missing.add_argument("folder", nargs="?", default=None, help="Quarter folder, e.g. 2025_09_30")
+    cik = sub.add_parser("cik", help="Everything known about one CIK")
+    cik.add_argument("cik")
+    args = parser.parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        if args.command == "import":
+            import_existing(catalog)
+        elif args.command == "summary":
+            for row in catalog.folder_summary():
+                print(f"{row['folder_name']}: drive {row['drive_files']} | dropbox {row['dropbox_files']} | failed {row['failed']}")
+            print(f"Migration states: {catalog.migration_counts()}")
+        elif args.command == "missing":
+            rows = catalog.missing_in_dropbox(args.folder)
+            for row in rows:
+                print(f"{row['folder_name']}/{row['file_name']}  fid={row['fid']}")
+            print(f"{len(rows)} files missing")
+        else:
+            print(json.dumps(catalog.files_for_cik(args.cik), indent=4))
+
+if __name__ == "__main__":
+    main()
+
+# python catalog.py import
+# python catalog.py missing 2025_09_30
+# python catalog.py cik 0001463262
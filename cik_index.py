@@ -0,0 +1,240 @@
+import os
+import re
+import sys
+import glob
+import json
+import mmap
+import time
+import struct
+import bisect
+import argparse
+
+# --- CONFIGURATION ---
+DEFAULT_INDEX_PATH = "cik_chunks/cik_index.bin"
+DEFAULT_PARQUET = "cik_chunks/cik_lookup.parquet"
+DEFAULT_JSON_GLOB = "cik_chunks/cik_data_part_*.json"
+
+# File layout (all little-endian):
+#   header  : magic, entry count, blob size
+#   entries : one fixed-size record per (name, cik), sorted by normalized name
+#   by_cik  : entry numbers sorted by CIK
+#   blob    : UTF-8 strings referenced by the entries
+MAGIC = b"CIKIDX01"
+_HEADER = struct.Struct("<8sQQ")
+_ENTRY = struct.Struct("<QIQIQ")   # norm_off, norm_len, name_off, name_len, cik
+_ORDER = struct.Struct("<I")
+
+_NON_ALNUM = re.compile(r"[^0-9A-Z]+")
+
+
+def normalize_name(name):
+    """'11:11 Capital Corp.' -> '11 11 CAPITAL CORP' (upper case, punctuation folded to single spaces)."""
+    return _NON_ALNUM.sub(" ", name.upper()).strip()
+
+
+# ==========================================
+# 1. BUILD
+# ==========================================
+
+def iter_source_records(source=None):
+    """Yields (name, cik) from cik_parser output: the Parquet file, or classic JSON chunks."""
+    source = source or (DEFAULT_PARQUET if os.path.exists(DEFAULT_PARQUET) else DEFAULT_JSON_GLOB)
+
+    if source.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(source)
+        for batch in parquet_file.iter_batches(columns=["name", "cik"]):
+            yield from zip(batch.column(0).to_pylist(), batch.column(1).to_pylist())
+        return
+
+    for path in sorted(glob.glob(source)):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, list):
+            continue  # Parquet manifest, not records
+        for record in data:
+            yield record.get("name"), record.get("cik")
+
+def build_index(source=None, index_path=DEFAULT_INDEX_PATH):
+    """Builds the on-disk index from cik_parser output. Returns the number of entries."""
+    print(f"Building CIK index from {source or 'cik_parser output'}...")
+    start_time = time.time()
+
+    unique = set()
+    for name, cik in iter_source_records(source):
+        if not name or cik is None:
+            continue
+        try:
+            cik_int = int(cik)
+        except ValueError:
+            continue
+        unique.add((normalize_name(name).encode('utf-8'), name.encode('utf-8'), cik_int))
+
+    entries = sorted(unique)
+    blob = bytearray()
+    packed_entries = bytearray()
+    for norm, name, cik_int in entries:
+        norm_off = len(blob)
+        blob += norm
+        name_off = len(blob)
+        blob += name
+        packed_entries += _ENTRY.pack(norm_off, len(norm), name_off, len(name), cik_int)
+
+    by_cik = sorted(range(len(entries)), key=lambda i: entries[i][2])
+    packed_order = b"".join(_ORDER.pack(i) for i in by_cik)
+
+    folder = os.path.dirname(index_path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    tmp_path = index_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(entries), len(blob)))
+        f.write(packed_entries)
+        f.write(packed_order)
+        f.write(blob)
+    os.replace(tmp_path, index_path)
+
+    print(f"Saved {index_path} ({len(entries)} entries, {os.path.getsize(index_path) / 1e6:.1f} MB) "
+          f"in {time.time() - start_time:.1f}s")
+    return len(entries)
+
+
+# ==========================================
+# 2. LOOKUP
+# ==========================================
+
+class _Column:
+    """Sequence view over the mmap so the stdlib bisect can search it without loading anything."""
+
+    def __init__(self, length, getter):
+        self._length = length
+        self._getter = getter
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, i):
+        return self._getter(i)
+
+
+class CIKIndex:
+    """
+    Memory-mapped CIK <-> name index.
+
+    Opening only maps the file (milliseconds, no parsing); each lookup is a
+    binary search over fixed-size records (microseconds).
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        self._file = open(index_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.size, blob_size = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{index_path} is not a CIK index file")
+
+        self._entries_off = _HEADER.size
+        self._order_off = self._entries_off + self.size * _ENTRY.size
+        self._blob_off = self._order_off + self.size * _ORDER.size
+
+        self._norms = _Column(self.size, self._norm_at)
+        self._ciks = _Column(self.size, lambda i: self._entry(self._order_at(i))[4])
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _entry(self, i):
+        return _ENTRY.unpack_from(self._mm, self._entries_off + i * _ENTRY.size)
+
+    def _order_at(self, i):
+        return _ORDER.unpack_from(self._mm, self._order_off + i * _ORDER.size)[0]
+
+    def _bytes(self, off, length):
+        start = self._blob_off + off
+        return self._mm[start : start + length]
+
+    def _norm_at(self, i):
+        norm_off, norm_len, _, _, _ = self._entry(i)
+        return self._bytes(norm_off, norm_len)
+
+    def _record(self, i):
+        _, _, name_off, name_len, cik_int = self._entry(i)
+        return {"name": self._bytes(name_off, name_len).decode('utf-8'), "cik": str(cik_int).zfill(10)}
+
+    def lookup_name(self, name):
+        """Exact match on the normalized name. Returns [{'name', 'cik'}, ...]."""
+        key = normalize_name(name).encode('utf-8')
+        lo = bisect.bisect_left(self._norms, key)
+        hi = bisect.bisect_right(self._norms, key, lo)
+        return [self._record(i) for i in range(lo, hi)]
+
+    def search_prefix(self, prefix, limit=20):
+        """All names starting with `prefix` (normalized), in name order, up to `limit`."""
+        key = normalize_name(prefix).encode('utf-8')
+        results = []
+        i = bisect.bisect_left(self._norms, key)
+        while i < self.size and len(results) < limit and self._norm_at(i).startswith(key):
+            results.append(self._record(i))
+            i += 1
+        return results
+
+    def names_for_cik(self, cik):
+        """Every name registered under this CIK (accepts padded or unpadded)."""
+        cik_int = int(cik)
+        lo = bisect.bisect_left(self._ciks, cik_int)
+        hi = bisect.bisect_right(self._ciks, cik_int, lo)
+        return [self._record(self._order_at(i))["name"] for i in range(lo, hi)]
+
+
+# ==========================================
+# 3. CLI
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the persistent CIK/name index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Build the index from cik_parser output")
+    build.add_argument("--source", default=None, help="Parquet file or JSON chunk glob")
+    build.add_argument("--index", default=DEFAULT_INDEX_PATH)
+
+    for command, help_text in (("name", "Exact name lookup"), ("prefix", "Name prefix search"), ("cik", "Names for a CIK")):
+        query = sub.add_parser(command, help=help_text)
+        query.add_argument("value")
+        query.add_argument("--index", default=DEFAULT_INDEX_PATH)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_index(args.source, args.index)
+        return
+
+    start_time = time.perf_counter()
+    with CIKIndex(args.index) as index:
+        loaded = time.perf_counter()
+        if args.command == "name":
+            results = index.lookup_name(args.value)
+        elif args.command == "prefix":
+            results = index.search_prefix(args.value)
+        else:
+            results = index.names_for_cik(args.value)
+        done = time.perf_counter()
+
+    for row in results:
+        print(row)
+    print(f"({len(results)} results | load {1e3 * (loaded - start_time):.2f} ms | query {1e6 * (done - loaded):.0f} us)",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
+
+# python cik_index.py build
+# python cik_index.py prefix "BLACKROCK"
+# python cik_index.py cik 0001463262
@@ -1,6 +1,16 @@
 import re
 import json
 import os
+import mmap
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+# --- CONFIGURATION ---
+PARQUET_OUTPUT = "cik_chunks/cik_lookup.parquet"
+MANIFEST_CHUNK_SIZE = 100000
+
+# Universal newlines, as text-mode iteration in parse_cik_file() sees them: \r\n, \r or \n
+LINE_BREAK = re.compile(r"\r\n|\r|\n")
 
 def parse_cik_file(input_filename, chunk_size=100000):
     # REGEX EXPLANATION:
@@ -57,6 +67,156 @@ def save_json_chunk(data, index):
         json.dump(data, f, indent=4)
     print(f"Saved {output_filename} ({len(data)} records)")
 
+# ==========================================
+# PARALLEL PARSER (mmap + byte ranges -> Parquet)
+# ==========================================
+
+def parse_line(line):
+    """
+    Same rule as the regex above (^(.*):(\d+):?$ on the stripped line), without regex:
+    drop one optional trailing colon, then split on the LAST colon.
+    Returns (name, cik) or None.
+    """
+    line = line.strip()
+    if line.endswith(":"):
+        line = line[:-1]
+    name, sep, cik = line.rpartition(":")
+    if not sep or not cik.isdecimal():
+        return None
+    return name.strip(), cik
+
+def split_byte_ranges(input_filename, parts):
+    """Cuts the file into ~equal byte ranges whose boundaries sit right after a newline."""
+    size = os.path.getsize(input_filename)
+    if size == 0:
+        return []
+
+    boundaries = [0]
+    with open(input_filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for i in range(1, parts):
+            pos = mm.find(b"\n", max(boundaries[-1], size * i // parts))
+            if pos == -1:
+                break
+            if pos + 1 > boundaries[-1]:
+                boundaries.append(pos + 1)
+    if boundaries[-1] != size:
+        boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+def _parse_byte_range(args):
+    """Worker: parses lines in [start, end) straight out of the memory-mapped file."""
+    input_filename, start, end = args
+    names = []
+    ciks = []
+    with open(input_filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        text = mm[start:end].decode('utf-8', errors='ignore')
+
+    # Same line ends as parse_cik_file() (a lone \r too); splitlines() would
+    # also break names on \x0b, \x1c, \u2028, ...
+    for line in LINE_BREAK.split(text):
+        parsed = parse_line(line)
+        if parsed:
+            names.append(parsed[0])
+            ciks.append(parsed[1])
+    return names, ciks
+
+def parse_cik_file_parallel(input_filename, output_path=PARQUET_OUTPUT, workers=None,
+                            manifest_chunk_size=MANIFEST_CHUNK_SIZE):
+    """
+    Parses cik-lookup-data.txt across all cores into one compact Parquet file
+    (columns: name, cik — same values and order as the JSON chunks).
+    If manifest_chunk_size is set, also writes cik_chunks/cik_data_part_N.json
+    manifests that point at row ranges of the Parquet file, so
+    process_cik_chunk.py / orchestrator.py keep working unchanged.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if not os.path.exists(input_filename):
+        print(f"Error: {input_filename} not found.")
+        return
+
+    workers = workers or os.cpu_count() or 4
+    # More ranges than workers keeps every core busy until the end
+    ranges = split_byte_ranges(input_filename, workers * 4)
+    print(f"Starting parallel processing: {input_filename} ({len(ranges)} byte ranges, {workers} workers)...")
+
+    output_folder = os.path.dirname(output_path)
+    if output_folder:
+        os.makedirs(output_folder, exist_ok=True)
+
+    schema = pa.schema([("name", pa.string()), ("cik", pa.string())])
+    total_processed = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+         pq.ParquetWriter(output_path, schema, compression="zstd") as writer:
+        # map() returns ranges in file order, so row order matches the text file
+        for names, ciks in executor.map(_parse_byte_range, [(input_filename, s, e) for s, e in ranges]):
+            if names:
+                writer.write_table(pa.table({"name": names, "cik": ciks}, schema=schema))
+                total_processed += len(names)
+
+    print(f"Finished! Parsed {total_processed} records into {output_path}")
+
+    if manifest_chunk_size:
+        write_chunk_manifests(output_path, total_processed, manifest_chunk_size)
+
+    return total_processed
+
+def write_chunk_manifests(parquet_path, total_rows, chunk_size=MANIFEST_CHUNK_SIZE, folder="cik_chunks"):
+    """Writes tiny cik_data_part_N.json files: {"source": ..., "offset": ..., "count": ...}."""
+    os.makedirs(folder, exist_ok=True)
+    chunk_count = 0
+    for offset in range(0, total_rows, chunk_size):
+        chunk_count += 1
+        manifest = {"source": parquet_path, "offset": offset, "count": min(chunk_size, total_rows - offset)}
+        with open(os.path.join(folder, f"cik_data_part_{chunk_count}.json"), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+    print(f"Saved {chunk_count} chunk manifests to {folder}/")
+
+def load_cik_chunk(chunk_path):
+    """
+    Loads a worker's chunk as a list of {"name", "cik"} dicts. Accepts both
+    the classic JSON list and the Parquet manifest written above.
+    """
+    with open(chunk_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        return data
+
+    import pyarrow.parquet as pq
+
+    # Read only the row groups that overlap [offset, offset + count)
+    parquet_file = pq.ParquetFile(data["source"])
+    start, stop = data["offset"], data["offset"] + data["count"]
+    groups = []
+    first_row = None
+    row = 0
+    for i in range(parquet_file.num_row_groups):
+        group_rows = parquet_file.metadata.row_group(i).num_rows
+        if row < stop and row + group_rows > start:
+            groups.append(i)
+            if first_row is None:
+                first_row = row
+        row += group_rows
+
+    if not groups:
+        return []
+    table = parquet_file.read_row_groups(groups, columns=["name", "cik"])
+    return table.slice(start - first_row, data["count"]).to_pylist()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_file", nargs="?", default="cik-lookup-data.txt")
+    parser.add_argument("--format", choices=["parquet", "json"], default="parquet",
+                        help="parquet = parallel parser + chunk manifests, json = classic 100k-record JSON chunks")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=MANIFEST_CHUNK_SIZE)
+    args = parser.parse_args()
+
     # Ensure your text file is in the same folder or provide the full path
-    parse_cik_file('cik-lookup-data.txt')
\ No newline at end of file
+    if args.format == "json":
+        parse_cik_file(args.input_file, chunk_size=args.chunk_size)
+    else:
+        parse_cik_file_parallel(args.input_file, workers=args.workers, manifest_chunk_size=args.chunk_size)
@@ -0,0 +1,54 @@
+import threading
+
+from drive_ops import GoogleDriveManager
+from dropbox_ops import DropboxManager
+
+
+class ClientPool:
+    """
+    One GoogleDriveManager / DropboxManager per thread, all cloned from a single
+    authenticated pair.
+
+    googleapiclient (httplib2) is not thread-safe, so worker threads must not share
+    a Drive service. Clones reuse the credentials and refresh token of the prototypes,
+    so the about().get / users_get_current_account checks run once per process,
+    not once per thread.
+    on_rate_limit: passed to DropboxManager.clone, so Dropbox 429s reach the caller
+    (e.g. an AdaptiveConcurrency controller) instead of being slept through by the SDK.
+    """
+
+    def __init__(self, drive, dropbox, dropbox_connections=8, on_rate_limit=None):
+        self._drive = drive
+        self._dropbox = dropbox
+        self._dropbox_connections = dropbox_connections
+        self._on_rate_limit = on_rate_limit
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.created = 0   # Clients built so far (two per thread that used both services)
+
+    @classmethod
+    def connect(cls, app_key, app_secret, refresh_token=None, dropbox_connections=8):
+        """Authenticates both services once (with the usual checks) and returns a pool."""
+        return cls(GoogleDriveManager(), DropboxManager(app_key, app_secret, refresh_token), dropbox_connections)
+
+    def _count(self):
+        with self._lock:
+            self.created += 1
+
+    def drive(self):
+        """This thread's GoogleDriveManager."""
+        client = getattr(self._local, "drive", None)
+        if client is None:
+            client = self._drive.clone()
+            self._local.drive = client
+            self._count()
+        return client
+
+    def dropbox(self):
+        """This thread's DropboxManager (own HTTP session)."""
+        client = getattr(self._local, "dropbox", None)
+        if client is None:
+            client = self._dropbox.clone(max_connections=self._dropbox_connections, on_rate_limit=self._on_rate_limit)
+            self._local.dropbox = client
+            self._count()
+        return client
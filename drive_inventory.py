@@ -0,0 +1,73 @@
+import os
+import csv
+import time
+import argparse
+
+from drive_ops import GoogleDriveManager, INVENTORY_WORKERS
+from catalog import Catalog, parse_form_file_name
+
+# --- CONFIGURATION ---
+OUTPUT_CSV = "drive_files.csv"
+FIELDNAMES = ["folder_name", "file_name", "cik", "acsn", "fid", "size_bytes"]
+CATALOG_BATCH = 5000          # Rows per catalog upsert
+
+
+def build_drive_inventory(root_folder_id, output_csv=OUTPUT_CSV, catalog=None, workers=INVENTORY_WORKERS):
+    """
+    Writes drive_files.csv (folder_name, file_name, cik, acsn, fid, size_bytes) for every file below
+    `root_folder_id`, row by row as the listing runs. cik/acsn come from the file name.
+    catalog: optional catalog.Catalog that receives the same rows in batches.
+    Returns the number of files written.
+    """
+    drive = GoogleDriveManager()
+    start_time = time.time()
+    tmp_path = output_csv + ".tmp"
+    written = 0
+    batch = []
+
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+
+        for row in drive.iter_files_recursive(root_folder_id, max_workers=workers):
+            cik, acsn = parse_form_file_name(row["file_name"])
+            row["cik"] = cik or ""
+            row["acsn"] = acsn or ""
+            writer.writerow(row)
+            written += 1
+
+            if catalog is not None:
+                batch.append(row)
+                if len(batch) >= CATALOG_BATCH:
+                    catalog.upsert_drive_files(batch)
+                    batch = []
+
+    if catalog is not None and batch:
+        catalog.upsert_drive_files(batch)
+
+    # Only replace the previous drive_files.csv once the listing is complete
+    os.replace(tmp_path, output_csv)
+
+    duration = time.time() - start_time
+    print(f"Saved {written} files to {output_csv} in {duration:.1f}s ({written / max(duration, 1e-6):.0f} files/s)")
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description="Recursive Google Drive inventory -> drive_files.csv (+ optional catalog).")
+    parser.add_argument("root", help="Drive folder ID holding the quarter folders")
+    parser.add_argument("--output", default=OUTPUT_CSV)
+    parser.add_argument("--catalog", action="store_true", help="Also upsert the rows into catalog.sqlite")
+    parser.add_argument("--workers", type=int, default=INVENTORY_WORKERS)
+    args = parser.parse_args()
+
+    catalog = Catalog() if args.catalog else None
+    try:
+        build_drive_inventory(args.root, args.output, catalog, args.workers)
+    finally:
+        if catalog is not None:
+            catalog.close()
+
+if __name__ == "__main__":
+    main()
+
+# python drive_inventory.py 1bjX-ozr5VDjsEsee8wr-mTow-u0iyr7_ --catalog
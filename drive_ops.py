@@ -1,11 +1,131 @@
 import os
 import io
 import csv
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload
+from googleapiclient.http import MediaFileUpload, MediaIoBaseUpload, MediaIoBaseDownload, build_http
 from google.auth import default
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
 
+# --- PIPE MODE ---
+DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024   # Bytes per MediaIoBaseDownload request (matches Dropbox session chunks)
+PIPE_BUFFER_CHUNKS = 2                   # Downloaded chunks allowed to wait for the uploader
+DOWNLOAD_RETRIES = 3                     # Retries per chunk inside MediaIoBaseDownload
+
+# --- RECURSIVE INVENTORY ---
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+INVENTORY_WORKERS = 8                    # Folders listed at the same time
+LIST_RETRIES = 3                         # execute(num_retries=...) for 429/5xx on list pages
+
+# --- BATCH OPERATIONS ---
+DRIVE_BATCH_LIMIT = 100                  # Calls per batch HTTP request (Drive API maximum)
+BATCH_RETRIES = 3                        # Re-sends of calls rejected by rate limiting inside a batch
+UPSERT_WORKERS = 4                       # Concurrent media uploads in upsert_files
+
+# --- RATE LIMITS ---
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")   # 403 reasons that mean "slow down"
+DEFAULT_RETRY_AFTER = 5.0                # Seconds to wait when a rate-limit response has no Retry-After
+
+
+def rate_limit_retry_after(error):
+    """
+    Seconds to wait if `error` is a Drive rate-limit response, else None.
+    Rate limits are HTTP 429, or 403 with reason rateLimitExceeded / userRateLimitExceeded.
+    Uses the Retry-After header when Google sends one.
+    """
+    if not isinstance(error, HttpError):
+        return None
+    status = getattr(error.resp, "status", None)
+    if status == 403:
+        content = error.content.decode('utf-8', 'replace') if isinstance(error.content, bytes) else str(error.content)
+        if not any(reason in content for reason in RATE_LIMIT_REASONS):
+            return None
+    elif status != 429:
+        return None
+    try:
+        return float(error.resp.get("retry-after"))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class DrivePipe:
+    """
+    Read-only file-like object fed by a background download thread.
+    Chunks pass through a bounded queue, so the download runs at most
+    PIPE_BUFFER_CHUNKS ahead of whoever is reading (e.g. a Dropbox upload session).
+    Download errors are raised from read().
+    num_retries: MediaIoBaseDownload retries per chunk (it also sleeps through 429s on its own;
+    pass 0 to get them raised instead, e.g. for an AdaptiveConcurrency controller).
+    """
+
+    def __init__(self, request, chunk_size=DOWNLOAD_CHUNK_SIZE, max_buffered=PIPE_BUFFER_CHUNKS,
+                 num_retries=DOWNLOAD_RETRIES):
+        self.chunk_size = chunk_size
+        self.num_retries = num_retries
+        self._queue = queue.Queue(maxsize=max_buffered)
+        self._stop = threading.Event()
+        self._buffer = b""
+        self._eof = False
+        self._error = None
+        self._thread = threading.Thread(target=self._produce, args=(request,), daemon=True)
+        self._thread.start()
+
+    def _put(self, item):
+        # Gives up once the reader has closed the pipe, so an abandoned download does not block forever
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, request):
+        try:
+            fh = io.BytesIO()
+            downloader = MediaIoBaseDownload(fh, request, chunksize=self.chunk_size)
+            done = False
+            while not done:
+                _, done = downloader.next_chunk(num_retries=self.num_retries)
+                data = fh.getvalue()
+                fh.seek(0)
+                fh.truncate()
+                if data and not self._put(data):
+                    return
+            self._put(None)
+        except Exception as e:
+            self._put(e)
+
+    def read(self, size=-1):
+        if self._error:
+            raise self._error
+
+        parts = []
+        received = 0
+        while not self._eof and (size < 0 or received < size):
+            if not self._buffer:
+                item = self._queue.get()
+                if item is None:
+                    self._eof = True
+                    break
+                if isinstance(item, Exception):
+                    self._error = item
+                    raise item
+                self._buffer = item
+            take = self._buffer if size < 0 else self._buffer[:size - received]
+            self._buffer = self._buffer[len(take):]
+            parts.append(take)
+            received += len(take)
+        return b"".join(parts)
+
+    def close(self):
+        self._stop.set()
+
+
 class GoogleDriveManager:
     """
     A wrapper class for Google Drive API v3 operations.
@@ -18,7 +138,9 @@ class GoogleDriveManager:
         """Initialize authentication using Application Default Credentials."""
         try:
             creds, _ = default(scopes=self.SCOPES)
+            self.creds = creds
             self.service = build("drive", "v3", credentials=creds)
+            self._local = threading.local()
             
             # Verify connection
             about = self.service.about().get(fields="user(displayName,emailAddress)").execute()
@@ -84,6 +206,74 @@ class GoogleDriveManager:
             print(f"Error listing folder: {e}")
             return []
 
+    def clone(self):
+        """
+        New manager on the same credentials with its own service (and httplib2 connection),
+        for use by another thread. Skips the about().get check done in __init__.
+        """
+        clone = object.__new__(GoogleDriveManager)
+        clone.creds = self.creds
+        clone.service = build("drive", "v3", credentials=self.creds, cache_discovery=False)
+        clone._local = threading.local()
+        return clone
+
+    def _thread_service(self):
+        """googleapiclient/httplib2 objects are not thread-safe: one service per thread, same credentials."""
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = build("drive", "v3", credentials=self.creds, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def _list_children(self, folder_id, folder_name):
+        """One folder, all pages, minimal fields. Returns (file rows, [(subfolder_id, subfolder_name)])."""
+        files = []
+        subfolders = []
+        page_token = None
+        while True:
+            resp = self._thread_service().files().list(
+                q=f"'{folder_id}' in parents and trashed=false",
+                fields="nextPageToken, files(id, name, mimeType, size)",
+                pageSize=1000,
+                pageToken=page_token,
+                includeItemsFromAllDrives=True,
+                supportsAllDrives=True
+            ).execute(num_retries=LIST_RETRIES)
+
+            for item in resp.get("files", []):
+                if item.get("mimeType") == FOLDER_MIME_TYPE:
+                    subfolders.append((item["id"], item["name"]))
+                else:
+                    files.append({"folder_name": folder_name, "file_name": item["name"], "fid": item["id"],
+                                  "size_bytes": item.get("size", "")})
+
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return files, subfolders
+
+    def iter_files_recursive(self, root_folder_id, max_workers=INVENTORY_WORKERS):
+        """
+        Yields {'folder_name', 'file_name', 'fid', 'size_bytes'} for every file below `root_folder_id`
+        (folder_name = the file's parent folder, e.g. the quarter folder 2025_09_30).
+        Subfolders are listed concurrently as soon as they are discovered, and rows are
+        yielded folder by folder, so nothing accumulates beyond the folders in flight.
+        """
+        root = self.service.files().get(fileId=root_folder_id, fields="name", supportsAllDrives=True).execute()
+        folders_done = 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(self._list_children, root_folder_id, root["name"])}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subfolders = future.result()
+                    for folder_id, folder_name in subfolders:
+                        pending.add(executor.submit(self._list_children, folder_id, folder_name))
+                    folders_done += 1
+                    if files:
+                        print(f"  [Drive inventory] {folders_done} folders listed, {len(pending)} in flight (+{len(files)} files)")
+                    yield from files
+
     def save_metadata_to_csv(self, folder_id, output_csv="gdrive_files.csv"):
         """Wraps get_all_files_metadata and saves to CSV."""
         data = self.get_all_files_metadata(folder_id)
@@ -194,6 +384,8 @@ class GoogleDriveManager:
         """
         Downloads a file into an in-memory BytesIO object.
         Perfect for streaming directly to Dropbox without disk usage.
+        Rate-limit errors are raised (see rate_limit_retry_after) so the caller can back off;
+        other HTTP errors return None.
         """
         try:
             request = self.service.files().get_media(fileId=file_id)
@@ -208,9 +400,24 @@ class GoogleDriveManager:
             fh.seek(0) # Reset pointer to start
             return fh
         except HttpError as e:
+            if rate_limit_retry_after(e) is not None:
+                raise
             print(f"Stream download failed: {e}")
             return None
 
+    def open_file_pipe(self, file_id, chunk_size=DOWNLOAD_CHUNK_SIZE, max_buffered=PIPE_BUFFER_CHUNKS,
+                       num_retries=DOWNLOAD_RETRIES):
+        """
+        Pipe mode: starts downloading in the background and returns a DrivePipe to read from.
+        Unlike get_file_stream, the caller can start uploading as soon as the first chunk
+        arrives, and at most `max_buffered` chunks are held in memory. Always close() it.
+        Each pipe downloads over its own connection: after close() the producer thread may
+        still be finishing a chunk while the caller (e.g. a retry) already uses this manager.
+        """
+        request = self.service.files().get_media(fileId=file_id)
+        request.http = AuthorizedHttp(self.creds, http=build_http())
+        return DrivePipe(request, chunk_size, max_buffered, num_retries)
+
     def download_file_to_disk(self, file_id, local_path):
         """Downloads a file to local disk."""
         stream = self.get_file_stream(file_id)
@@ -236,6 +443,142 @@ class GoogleDriveManager:
             print(f"Delete failed: {e}")
             return False
 
+    # ==========================================
+    # 5. BATCH OPERATIONS
+    # ==========================================
+
+    def _run_batch(self, calls):
+        """
+        calls: list of (key, HttpRequest). Sends them DRIVE_BATCH_LIMIT per HTTP round-trip
+        and re-sends calls rejected by rate limiting (see rate_limit_retry_after) after the
+        longest Retry-After among them.
+        Returns {key: (response, error)}.
+        """
+        results = {}
+        pending = list(calls)
+
+        for attempt in range(BATCH_RETRIES + 1):
+            retry = []
+            waits = []
+            for i in range(0, len(pending), DRIVE_BATCH_LIMIT):
+                group = pending[i : i + DRIVE_BATCH_LIMIT]
+                by_id = {str(n): (key, request) for n, (key, request) in enumerate(group)}
+
+                def callback(request_id, response, exception):
+                    key, request = by_id[request_id]
+                    # Only real rate limits are re-sent; other 403s (permissions, quota) are final
+                    wait = rate_limit_retry_after(exception)
+                    if wait is not None and attempt < BATCH_RETRIES:
+                        retry.append((key, request))
+                        waits.append(wait)
+                    else:
+                        results[key] = (response, exception)
+
+                batch = self.service.new_batch_http_request(callback=callback)
+                for request_id, (_, request) in by_id.items():
+                    batch.add(request, request_id=request_id)
+                batch.execute()
+
+            if not retry:
+                break
+            wait = max(waits)
+            print(f"  [Batch] {len(retry)} calls rate limited. Retrying in {wait:.1f}s...")
+            time.sleep(wait)
+            pending = retry
+
+        return results
+
+    def _list_names(self, parent_folder_id, folders_only=False):
+        """{name: id} of a folder's children, one paginated listing instead of a query per name."""
+        query = f"'{parent_folder_id}' in parents and trashed = false"
+        if folders_only:
+            query += f" and mimeType = '{FOLDER_MIME_TYPE}'"
+        names = {}
+        page_token = None
+        while True:
+            resp = self.service.files().list(
+                q=query, fields="nextPageToken, files(id, name)", pageSize=1000, pageToken=page_token,
+                includeItemsFromAllDrives=True, supportsAllDrives=True
+            ).execute(num_retries=LIST_RETRIES)
+            for item in resp.get("files", []):
+                names.setdefault(item["name"], item["id"])
+            page_token = resp.get("nextPageToken")
+            if not page_token:
+                return names
+
+    def create_folders(self, folder_names, parent_folder_id):
+        """
+        Batch version of create_folder: one listing of the parent, then the missing
+        folders are created DRIVE_BATCH_LIMIT per HTTP call.
+        Returns {folder_name: folder_id} (None where creation failed).
+        """
+        existing = self._list_names(parent_folder_id, folders_only=True)
+        result = {name: existing[name] for name in folder_names if name in existing}
+        to_create = sorted({name for name in folder_names if name not in existing})
+
+        calls = [
+            (name, self.service.files().create(
+                body={"name": name, "mimeType": FOLDER_MIME_TYPE, "parents": [parent_folder_id]},
+                fields="id, name", supportsAllDrives=True))
+            for name in to_create
+        ]
+        for name, (response, error) in self._run_batch(calls).items():
+            if error:
+                print(f"Folder creation failed for {name}: {error}")
+            result[name] = response["id"] if response else None
+
+        print(f"Folders: {len(existing)} existing, {len(to_create)} created under {parent_folder_id}")
+        return result
+
+    def upsert_files(self, items):
+        """
+        Batch version of upload_file. items: iterable of (local_path, parent_folder_id).
+        Existing IDs are resolved with one listing per parent instead of one query per file.
+        The Drive batch endpoint does not accept media, so the uploads themselves run
+        concurrently (UPSERT_WORKERS threads, one service each).
+        Returns {local_path: file_id} (None where the upload failed).
+        """
+        items = list(items)
+        existing_by_parent = {parent: self._list_names(parent) for parent in {p for _, p in items}}
+
+        def upload(local_path, parent_folder_id):
+            # Same check as upload_file; MediaFileUpload would raise and abort the whole map
+            if not os.path.exists(local_path):
+                print(f"Local file not found: {local_path}")
+                return local_path, None
+            filename = os.path.basename(local_path)
+            existing_id = existing_by_parent[parent_folder_id].get(filename)
+            try:
+                media = MediaFileUpload(local_path, resumable=True)
+                files = self._thread_service().files()
+                if existing_id:
+                    file = files.update(fileId=existing_id, media_body=media, fields="id",
+                                        supportsAllDrives=True).execute(num_retries=LIST_RETRIES)
+                else:
+                    file = files.create(body={"name": filename, "parents": [parent_folder_id]}, media_body=media,
+                                        fields="id", supportsAllDrives=True).execute(num_retries=LIST_RETRIES)
+                return local_path, file.get("id")
+            except (HttpError, OSError) as e:
+                print(f"Upload failed for {local_path}: {e}")
+                return local_path, None
+
+        with ThreadPoolExecutor(max_workers=UPSERT_WORKERS) as executor:
+            result = dict(executor.map(lambda item: upload(*item), items))
+
+        print(f"Upserted {sum(1 for v in result.values() if v)}/{len(items)} files")
+        return result
+
+    def delete_files(self, file_ids):
+        """Batch version of delete_file. Returns {file_id: True/False}."""
+        calls = [(fid, self.service.files().delete(fileId=fid, supportsAllDrives=True)) for fid in file_ids]
+        result = {}
+        for fid, (_, error) in self._run_batch(calls).items():
+            if error:
+                print(f"Delete failed for {fid}: {error}")
+            result[fid] = error is None
+        print(f"Deleted {sum(result.values())}/{len(result)} files")
+        return result
+
 # ==========================================
 # EXAMPLE USAGE
 # ==========================================
@@ -1,10 +1,109 @@
 import dropbox
 import dropbox.files
 from dropbox import DropboxOAuth2FlowNoRedirect
-from dropbox.exceptions import ApiError, AuthError
+from dropbox.exceptions import ApiError, AuthError, RateLimitError
 import os
 import csv
 import io
+import re
+import gzip
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# --- UPLOAD SESSION LIMITS ---
+SESSION_CHUNK_SIZE = 8 * 1024 * 1024          # Bytes per upload_session_append call
+UPLOAD_SESSION_THRESHOLD = 16 * 1024 * 1024   # upload_stream switches to chunked sessions above this
+CHUNK_MAX_RETRIES = 4                          # Attempts per chunk before the upload gives up
+FINISH_BATCH_MAX = 1000                        # Dropbox limit for upload_session_finish_batch_v2
+DEFAULT_RATE_LIMIT_BACKOFF = 5.0               # Same default as the SDK when a 429 has no Retry-After
+DROPBOX_HASH_BLOCK_SIZE = 4 * 1024 * 1024      # Block size of Dropbox's content_hash
+SKIPPED_UNCHANGED = "skipped: identical content_hash"   # upload_stream result when remote_hash matched
+
+# Dropbox wants batch commits serialized per account: one finish_batch at a time in this process.
+# Separate processes calling upload_many still contend and get too_many_write_operations / 429s.
+_FINISH_BATCH_LOCK = threading.Lock()
+
+# --- PARALLEL LISTING ---
+LISTING_WORKERS = 16                           # Subfolders (e.g. quarter folders) listed at the same time
+
+# --- INVENTORY SNAPSHOTS ---
+INVENTORY_FOLDER = "dropbox_inventory"        # One snapshot (cursor + files) per listed Dropbox folder
+
+
+def inventory_snapshot_path(folder_path, inventory_folder=INVENTORY_FOLDER):
+    """'/Nizar/sec_forms' -> 'dropbox_inventory/nizar_sec_forms.json.gz'"""
+    name = re.sub(r"[^0-9a-z]+", "_", folder_path.lower()).strip("_") or "root"
+    return os.path.join(inventory_folder, f"{name}.json.gz")
+
+
+class DropboxContentHasher:
+    """
+    Dropbox content_hash, computed incrementally as data passes through:
+    SHA-256 of every 4 MB block, then SHA-256 of the concatenated block digests.
+    Same value as FileMetadata.content_hash, so no download is needed to compare.
+    """
+
+    def __init__(self):
+        self._overall = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_pos = 0
+
+    def update(self, data):
+        view = memoryview(data)
+        pos = 0
+        while pos < len(view):
+            if self._block_pos == DROPBOX_HASH_BLOCK_SIZE:
+                self._overall.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_pos = 0
+            take = min(len(view) - pos, DROPBOX_HASH_BLOCK_SIZE - self._block_pos)
+            self._block.update(view[pos : pos + take])
+            self._block_pos += take
+            pos += take
+
+    def hexdigest(self):
+        overall = self._overall.copy()
+        if self._block_pos:
+            overall.update(self._block.digest())
+        return overall.hexdigest()
+
+
+def content_hash(data):
+    """Dropbox content_hash of an in-memory payload."""
+    hasher = DropboxContentHasher()
+    hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _iter_chunks(data=b"", source=None, chunk_size=None):
+    """
+    Yields fixed-size chunks of `data` followed by whatever `source` (a file-like) still holds.
+    Only one chunk is read from `source` at a time. Always yields at least one (possibly empty) chunk.
+    """
+    chunk_size = chunk_size or SESSION_CHUNK_SIZE
+    pos = 0
+    while len(data) - pos >= chunk_size:
+        yield data[pos : pos + chunk_size]
+        pos += chunk_size
+    tail = data[pos:]
+    sent_any = pos > 0
+
+    if source is not None:
+        while True:
+            more = source.read(chunk_size - len(tail))
+            if not more:
+                break
+            tail += more
+            if len(tail) == chunk_size:
+                yield tail
+                tail = b""
+                sent_any = True
+
+    if tail or not sent_any:
+        yield tail
 
 class DropboxManager:
     """
@@ -20,6 +119,8 @@ class DropboxManager:
         """
         self.app_key = app_key
         self.app_secret = app_secret
+        # Optional callback(backoff_seconds) for 429s retried inside upload sessions (see clone)
+        self.on_rate_limit = None
         
         # 1. If no token provided, get one via user interaction
         if not refresh_token:
@@ -45,6 +146,27 @@ class DropboxManager:
             print("Try running without a refresh token to generate a new one.")
             raise e
 
+    def clone(self, max_connections=8, on_rate_limit=None):
+        """
+        New manager with its own HTTP session, reusing this one's refresh token and
+        current access token. Skips the interactive flow and users_get_current_account.
+
+        on_rate_limit: callback(backoff_seconds). When set, the SDK no longer sleeps through
+        429s on its own: single calls raise RateLimitError to the caller, and upload-session
+        calls report the backoff here, wait exactly that long and retry.
+        """
+        clone = object.__new__(DropboxManager)
+        clone.app_key = self.app_key
+        clone.app_secret = self.app_secret
+        clone.refresh_token = self.refresh_token
+        clone.on_rate_limit = on_rate_limit
+        session = dropbox.create_session(max_connections=max_connections)
+        if on_rate_limit is None:
+            clone.dbx = self.dbx.clone(session=session)
+        else:
+            clone.dbx = self.dbx.clone(session=session, max_retries_on_rate_limit=0)
+        return clone
+
     def _authorize_interactive(self):
         """Helper to handle the OAuth handshake inside the script."""
         auth_flow = DropboxOAuth2FlowNoRedirect(
@@ -80,31 +202,76 @@ class DropboxManager:
     # 1. LISTING & METADATA (READ)
     # ==========================================
 
-    def get_all_files_metadata(self, folder_path, recursive=True):
-        """Retrieves metadata for ALL files recursively."""
+    @staticmethod
+    def _file_record(entry):
+        """Flattens a FileMetadata into the dict used by listings, CSVs and inventory snapshots."""
+        path_parts = entry.path_display.split('/')
+        folder_name = path_parts[-2] if len(path_parts) > 1 else ""
+        return {
+            "folder_name": folder_name,
+            "file_name": entry.name,
+            "path_display": entry.path_display,
+            "size_bytes": entry.size,
+            "server_modified": entry.server_modified.isoformat(),
+            "content_hash": entry.content_hash,
+            "id": entry.id
+        }
+
+    def _list_entries(self, folder_path, recursive=True):
+        """Yields every entry of one list_folder listing, page by page."""
+        result = self.dbx.files_list_folder(folder_path, recursive=recursive)
+        yield from result.entries
+        while result.has_more:
+            result = self.dbx.files_list_folder_continue(result.cursor)
+            yield from result.entries
+
+    def iter_file_entries_parallel(self, folder_path, max_workers=LISTING_WORKERS):
+        """
+        Yields the FileMetadata of every file under `folder_path`, sharded by subfolder:
+        the top level is listed first, then every subfolder (e.g. the quarter folders
+        2001_12_31, 2025_09_30, ...) gets its own recursive listing on a thread pool.
+        Files are yielded as each subfolder finishes, so the caller sees one merged stream.
+        """
+        subfolders = []
+        for entry in self._list_entries(folder_path, recursive=False):
+            if isinstance(entry, dropbox.files.FileMetadata):
+                yield entry
+            elif isinstance(entry, dropbox.files.FolderMetadata):
+                subfolders.append(entry.path_lower)
+
+        def list_subtree(path):
+            return [e for e in self._list_entries(path) if isinstance(e, dropbox.files.FileMetadata)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(list_subtree, path) for path in subfolders]
+            for done, future in enumerate(as_completed(futures), start=1):
+                entries = future.result()
+                print(f"  [Parallel listing] {done}/{len(subfolders)} folders done (+{len(entries)} files)")
+                yield from entries
+
+    def get_all_files_metadata(self, folder_path, recursive=True, parallel=False, max_workers=LISTING_WORKERS):
+        """
+        Retrieves metadata for ALL files recursively.
+        parallel=True lists each top-level subfolder concurrently (see iter_file_entries_parallel).
+        """
         print(f"Recursively scanning folder: {folder_path}...")
         files_data = []
         
         try:
             if folder_path == "/" or folder_path == ".": 
                 folder_path = ""
+
+            if parallel and recursive:
+                files_data = [self._file_record(e) for e in self.iter_file_entries_parallel(folder_path, max_workers)]
+                print(f"Scan complete. Found {len(files_data)} files.")
+                return files_data
                 
             result = self.dbx.files_list_folder(folder_path, recursive=recursive)
             
             def process_entries(entries):
                 for entry in entries:
                     if isinstance(entry, dropbox.files.FileMetadata):
-                        path_parts = entry.path_display.split('/')
-                        folder_name = path_parts[-2] if len(path_parts) > 1 else ""
-
-                        files_data.append({
-                            "folder_name": folder_name,
-                            "file_name": entry.name,
-                            "path_display": entry.path_display,
-                            "size_bytes": entry.size,
-                            "server_modified": entry.server_modified.isoformat(),
-                            "id": entry.id
-                        })
+                        files_data.append(self._file_record(entry))
 
             process_entries(result.entries)
 
@@ -120,6 +287,98 @@ class DropboxManager:
             print(f"Error listing folder {folder_path}: {e}")
             return []
 
+    def sync_inventory(self, folder_path, snapshot_path=None, catalog=None):
+        """
+        Returns {path_lower: record} for every file under `folder_path` (records as in
+        get_all_files_metadata), backed by a local snapshot that also stores the list_folder cursor.
+        - First run: a full listing, one subfolder per thread (iter_file_entries_parallel).
+        - Later runs: only files_list_folder_continue from the saved cursor, applying the adds
+          and deletes since the last sync (seconds instead of a full rescan).
+        - If Dropbox resets the cursor, falls back to a full listing.
+        catalog: optional catalog.Catalog; the same adds/deletes are applied to its dropbox_files table.
+        """
+        if folder_path == "/" or folder_path == ".":
+            folder_path = ""
+        snapshot_path = snapshot_path or inventory_snapshot_path(folder_path)
+        start_time = time.time()
+
+        files = {}
+        cursor = None
+        if os.path.exists(snapshot_path):
+            with gzip.open(snapshot_path, 'rt', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if snapshot.get("folder") == folder_path.lower():
+                files = snapshot["files"]
+                cursor = snapshot["cursor"]
+
+        full_scan = False
+        try:
+            result = None
+            if cursor:
+                print(f"Syncing inventory of {folder_path} from saved cursor ({len(files)} files in snapshot)...")
+                try:
+                    result = self.dbx.files_list_folder_continue(cursor)
+                except ApiError as e:
+                    if not (isinstance(e.error, dropbox.files.ListFolderContinueError) and e.error.is_reset()):
+                        raise
+                    print("Saved cursor was reset by Dropbox. Rescanning...")
+            if result is None:
+                print(f"Full inventory scan of {folder_path} (subfolders in parallel)...")
+                # Cursor first: anything that changes during the scan is replayed by the continue below
+                latest = self.dbx.files_list_folder_get_latest_cursor(folder_path, recursive=True)
+                files = {entry.path_lower: self._file_record(entry) for entry in self.iter_file_entries_parallel(folder_path)}
+                full_scan = True
+                result = self.dbx.files_list_folder_continue(latest.cursor)
+
+            changed = 0
+            updated = set()
+            removed = []
+            while True:
+                for entry in result.entries:
+                    if isinstance(entry, dropbox.files.FileMetadata):
+                        files[entry.path_lower] = self._file_record(entry)
+                        updated.add(entry.path_lower)
+                        changed += 1
+                    elif isinstance(entry, dropbox.files.DeletedMetadata):
+                        changed += 1
+                        # Applied in delta order, so files re-added after the delete survive it
+                        if entry.path_lower in files:
+                            gone = [entry.path_lower]
+                        else:
+                            # A deleted folder arrives as one entry: drop every file below it
+                            prefix = entry.path_lower + "/"
+                            gone = [p for p in files if p.startswith(prefix)]
+                        for path_lower in gone:
+                            removed.append(files.pop(path_lower)["path_display"])
+                            updated.discard(path_lower)
+                if not result.has_more:
+                    break
+                print(f"Fetching more changes... ({changed} so far)")
+                result = self.dbx.files_list_folder_continue(result.cursor)
+
+        except ApiError as e:
+            print(f"Error syncing inventory of {folder_path}: {e}")
+            return files
+
+        folder = os.path.dirname(snapshot_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp_path = snapshot_path + ".tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump({"folder": folder_path.lower(), "cursor": result.cursor, "files": files}, f)
+        os.replace(tmp_path, snapshot_path)
+
+        if catalog is not None:
+            if full_scan or catalog.count_dropbox_files(folder_path) == 0:
+                catalog.replace_dropbox_folder(folder_path, files.values())
+            else:
+                # Deletes first: a path deleted and then re-added in this delta is in both lists
+                catalog.delete_dropbox_files(removed)
+                catalog.upsert_dropbox_files(files[p] for p in updated)
+
+        print(f"Inventory synced: {len(files)} files ({changed} changes applied) in {time.time() - start_time:.1f}s")
+        return files
+
     def save_metadata_to_csv(self, folder_path, output_csv="dropbox_files.csv"):
         """Wraps get_all_files_metadata and saves to CSV."""
         data = self.get_all_files_metadata(folder_path)
@@ -127,7 +386,7 @@ class DropboxManager:
             print("No data to save.")
             return
 
-        fieldnames = ["folder_name", "file_name", "size_bytes", "server_modified", "path_display", "id"]
+        fieldnames = ["folder_name", "file_name", "size_bytes", "server_modified", "path_display", "content_hash", "id"]
         try:
             with open(output_csv, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=fieldnames)
@@ -154,20 +413,51 @@ class DropboxManager:
             print(f"Folder creation issue: {e}")
             return None
 
-    def upload_stream(self, file_bytes, dropbox_path):
+    def upload_stream(self, file_bytes, dropbox_path, session_threshold=UPLOAD_SESSION_THRESHOLD, remote_hash=None):
+        """
+        Uploads bytes or a file-like object (overwrite).
+        Up to `session_threshold` bytes go in one files_upload call; anything larger is
+        streamed through an upload session in SESSION_CHUNK_SIZE chunks, so memory stays
+        bounded and a failed chunk is retried on its own instead of restarting the file.
+
+        remote_hash: content_hash of the file currently at `dropbox_path` (from a listing).
+        If the payload is in memory and hashes the same, nothing is sent and SKIPPED_UNCHANGED
+        is returned. Every upload is checked against the content_hash Dropbox reports back;
+        a mismatch returns None like any other failed upload.
+        """
         try:
-            if hasattr(file_bytes, 'read'): data = file_bytes.read()
-            else: data = file_bytes
-            
-            meta = self.dbx.files_upload(data, dropbox_path, mode=dropbox.files.WriteMode("overwrite"))
-            return meta
+            source = file_bytes if hasattr(file_bytes, 'read') else None
+            head = source.read(session_threshold + 1) if source else file_bytes
+            hasher = DropboxContentHasher()
+
+            if remote_hash and (source is None or len(head) <= session_threshold):
+                if content_hash(head) == remote_hash:
+                    return SKIPPED_UNCHANGED
+
+            if len(head) <= session_threshold:
+                hasher.update(head)
+                meta = self.dbx.files_upload(head, dropbox_path, mode=dropbox.files.WriteMode("overwrite"))
+                return self._verified(meta, hasher.hexdigest())
+
+            cursor = self._upload_chunks(_iter_chunks(head, source), hasher=hasher)
+            commit = dropbox.files.CommitInfo(path=dropbox_path, mode=dropbox.files.WriteMode("overwrite"))
+            local_hash = hasher.hexdigest()
+            return self._verified(self._finish_session(cursor, commit, local_hash), local_hash)
         except ApiError as e:
             print(f"Stream upload failed: {e}")
             return None
+
+    def _verified(self, meta, local_hash):
+        """Returns `meta` if Dropbox stored exactly the bytes we hashed, else None."""
+        if meta is not None and meta.content_hash != local_hash:
+            print(f"Content hash mismatch for {meta.path_display}: sent {local_hash}, stored {meta.content_hash}")
+            return None
+        return meta
         
-    def get_parquet_files(self, folder_path, output_csv="parquet_inventory.csv"):
+    def get_parquet_files(self, folder_path, output_csv="parquet_inventory.csv", parallel=False):
         """
         Retrieves .parquet files and saves them to CSV immediately upon finding them.
+        parallel=True lists each top-level subfolder concurrently (see iter_file_entries_parallel).
         """
         print(f"Scanning for Parquet files in: {folder_path}...")
         print(f"Progress will be saved to: {output_csv}")
@@ -185,8 +475,6 @@ class DropboxManager:
                 writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
                 writer.writeheader()
 
-                result = self.dbx.files_list_folder(folder_path, recursive=True)
-                
                 def process_entries(entries):
                     nonlocal total_items_checked
                     for entry in entries:
@@ -216,11 +504,17 @@ class DropboxManager:
                                 
                                 print(f"  [SAVED] {entry.path_display}")
 
-                # Process first batch
-                process_entries(result.entries)
+                if parallel:
+                    process_entries(self.iter_file_entries_parallel(folder_path))
+                    result = None
+                else:
+                    result = self.dbx.files_list_folder(folder_path, recursive=True)
+
+                    # Process first batch
+                    process_entries(result.entries)
 
                 # Process continuation batches
-                while result.has_more:
+                while result and result.has_more:
                     print(f"--- Scanned {total_items_checked} items so far... ---")
                     result = self.dbx.files_list_folder_continue(result.cursor)
                     process_entries(result.entries)
@@ -234,4 +528,214 @@ class DropboxManager:
             return parquet_files
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-            return parquet_files
\ No newline at end of file
+            return parquet_files
+
+    # ==========================================
+    # 3. BATCH UPLOADS (Upload Sessions)
+    # ==========================================
+
+    def _send_chunk(self, chunk, cursor, close=False):
+        """
+        Starts the session (cursor=None) or appends one chunk, retrying transient errors.
+        Returns the cursor advanced past the chunk.
+        """
+        for attempt in range(1, CHUNK_MAX_RETRIES + 1):
+            try:
+                if cursor is None:
+                    session = self.dbx.files_upload_session_start(chunk, close=close)
+                    return dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=len(chunk))
+                self.dbx.files_upload_session_append_v2(chunk, cursor, close=close)
+                cursor.offset += len(chunk)
+                return cursor
+            except ApiError as e:
+                # The previous attempt may have landed even though its response was lost
+                if cursor is not None and e.error.is_incorrect_offset():
+                    correct_offset = e.error.get_incorrect_offset().correct_offset
+                    if correct_offset == cursor.offset + len(chunk):
+                        cursor.offset = correct_offset
+                        return cursor
+                raise
+            except RateLimitError as e:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                self._wait_rate_limit(e)
+            except Exception as e:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                offset = cursor.offset if cursor else 0
+                print(f"    [Chunk @ {offset}] Attempt {attempt} failed: {e}. Retrying...")
+                time.sleep(attempt * 2)
+
+    def _wait_rate_limit(self, error):
+        """Sleeps exactly the backoff Dropbox asked for (Retry-After), after telling on_rate_limit."""
+        backoff = error.backoff if error.backoff is not None else DEFAULT_RATE_LIMIT_BACKOFF
+        if self.on_rate_limit:
+            self.on_rate_limit(backoff)
+        time.sleep(backoff)
+
+    def _upload_chunks(self, chunks, close=False, hasher=None):
+        """
+        Sends an iterator of chunks through one new upload session. Returns the final cursor.
+        hasher: optional DropboxContentHasher fed with every chunk on the way out.
+        """
+        chunks = iter(chunks)
+        cursor = None
+        current = next(chunks)
+        for following in chunks:
+            if hasher:
+                hasher.update(current)
+            cursor = self._send_chunk(current, cursor)
+            current = following
+        if hasher:
+            hasher.update(current)
+        return self._send_chunk(current, cursor, close=close)
+
+    def _finish_session(self, cursor, commit, local_hash=None):
+        """
+        Commits the session, retrying transient errors.
+        local_hash: content_hash of the data sent. If a retry finds the session already gone
+        (an earlier attempt committed but its response was lost), the file at commit.path
+        counts as committed when it holds exactly those bytes.
+        """
+        for attempt in range(1, CHUNK_MAX_RETRIES + 1):
+            try:
+                return self.dbx.files_upload_session_finish(b"", cursor, commit)
+            except ApiError as e:
+                if attempt > 1 and local_hash and e.error.is_lookup_failed():
+                    meta = self._committed_copy(commit.path, local_hash)
+                    if meta is not None:
+                        return meta
+                raise
+            except RateLimitError as e:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                self._wait_rate_limit(e)
+            except Exception as e:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                print(f"    [Finish] Attempt {attempt} failed: {e}. Retrying...")
+                time.sleep(attempt * 2)
+
+    def _committed_copy(self, path, local_hash):
+        """FileMetadata of `path` if it already holds the bytes hashed to `local_hash`, else None."""
+        try:
+            meta = self.dbx.files_get_metadata(path)
+        except ApiError:
+            return None
+        if isinstance(meta, dropbox.files.FileMetadata) and meta.content_hash == local_hash:
+            return meta
+        return None
+
+    def _finish_batch(self, pending):
+        """
+        Commits up to FINISH_BATCH_MAX closed sessions with ONE finish_batch_v2 call
+        (one namespace write lock instead of one per file).
+        pending: list of (path, cursor). Returns a list of per-file result dicts.
+
+        Commits are serialized through _FINISH_BATCH_LOCK. A 429 waits the Retry-After and
+        re-sends the batch; entries that failed with too_many_write_operations are re-sent
+        after a short pause. Other per-file failures are returned as they are.
+        """
+        results = [None] * len(pending)
+        todo = list(range(len(pending)))
+
+        for attempt in range(1, CHUNK_MAX_RETRIES + 1):
+            entries = [
+                dropbox.files.UploadSessionFinishArg(
+                    cursor=pending[i][1],
+                    commit=dropbox.files.CommitInfo(path=pending[i][0], mode=dropbox.files.WriteMode("overwrite"))
+                )
+                for i in todo
+            ]
+            try:
+                with _FINISH_BATCH_LOCK:
+                    batch_result = self.dbx.files_upload_session_finish_batch_v2(entries)
+            except RateLimitError as e:
+                if attempt == CHUNK_MAX_RETRIES:
+                    raise
+                self._wait_rate_limit(e)
+                continue
+
+            contended = []
+            for i, entry in zip(todo, batch_result.entries):
+                path = pending[i][0]
+                if entry.is_success():
+                    results[i] = {"path": path, "success": True, "metadata": entry.get_success(), "error": None}
+                else:
+                    failure = entry.get_failure()
+                    results[i] = {"path": path, "success": False, "metadata": None, "error": str(failure)}
+                    if failure.is_too_many_write_operations():
+                        contended.append(i)
+
+            if not contended or attempt == CHUNK_MAX_RETRIES:
+                break
+            print(f"    [Finish Batch] {len(contended)} files hit too_many_write_operations. Retrying...")
+            todo = contended
+            time.sleep(attempt * 2)
+
+        return results
+
+    def upload_many(self, items, batch_size=FINISH_BATCH_MAX, max_workers=8):
+        """
+        Uploads many small files with few commits.
+        items: iterable of (bytes_or_filelike, dropbox_path). Consumed lazily, batch by batch.
+        - Data goes into upload sessions (started concurrently on `max_workers` threads).
+        - Every `batch_size` files are committed together with upload_session_finish_batch_v2.
+        - Each committed file is checked against the content_hash computed while sending it.
+        Returns a list of {"path", "success", "metadata", "error"} in input order.
+        """
+        batch_size = min(batch_size, FINISH_BATCH_MAX)
+        results = []
+
+        def start_session(item):
+            source, path = item
+            try:
+                if hasattr(source, 'read'):
+                    chunks = _iter_chunks(source=source)
+                else:
+                    chunks = _iter_chunks(source)
+                hasher = DropboxContentHasher()
+                cursor = self._upload_chunks(chunks, close=True, hasher=hasher)
+                return path, (cursor, hasher.hexdigest()), None
+            except Exception as e:
+                return path, None, str(e)
+
+        def flush(batch):
+            batch_results = [None] * len(batch)
+            pending = []
+            local_hashes = []
+            pending_positions = []
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i, (path, session, error) in enumerate(executor.map(start_session, batch)):
+                    if session is None:
+                        batch_results[i] = {"path": path, "success": False, "metadata": None, "error": error}
+                    else:
+                        pending.append((path, session[0]))
+                        local_hashes.append(session[1])
+                        pending_positions.append(i)
+
+            if pending:
+                try:
+                    committed = self._finish_batch(pending)
+                except (ApiError, RateLimitError) as e:
+                    print(f"Batch commit failed: {e}")
+                    committed = [{"path": path, "success": False, "metadata": None, "error": str(e)} for path, _ in pending]
+                for i, local_hash, result in zip(pending_positions, local_hashes, committed):
+                    if result["success"] and self._verified(result["metadata"], local_hash) is None:
+                        result = {"path": result["path"], "success": False, "metadata": None, "error": "content_hash mismatch"}
+                    batch_results[i] = result
+
+            ok = sum(1 for r in batch_results if r["success"])
+            print(f"  [Batch Upload] Committed {ok}/{len(batch)} files")
+            results.extend(batch_results)
+
+        batch = []
+        for item in items:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        return results
@@ -0,0 +1,52 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(data):
+    """JSON decode using orjson when installed (several times faster on submissions files)."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def get_recent(form_result):
+    """Returns the filings.recent block (dict of parallel arrays) or {}."""
+    filings = form_result.get('filings') or {}
+    return filings.get('recent') or {}
+
+
+def find_13f_indices(forms):
+    """
+    Positions of every 13F variation (13F-HR, 13F-NT, 13F-HR/A, ...) in the 'form' array.
+    Same rule as df['form'].str.contains('13F', na=False): non-strings never match.
+    """
+    return [i for i, form in enumerate(forms) if isinstance(form, str) and '13F' in form]
+
+
+def count_13f(form_result):
+    """Number of 13F rows in filings.recent, without building a DataFrame."""
+    forms = get_recent(form_result).get('form') or []
+    return len(find_13f_indices(forms))
+
+
+def extract_13f_columns(recent, columns=None):
+    """
+    Gathers only the 13F rows out of a filings.recent block.
+
+    recent:  dict of parallel arrays (accessionNumber, filingDate, form, ...).
+    columns: which arrays to gather (default: all of them, in their original order).
+    Returns a dict of column -> list, ready for pd.DataFrame(...). Empty dict if no 13F rows.
+    """
+    forms = recent.get('form') or []
+    indices = find_13f_indices(forms)
+    if not indices:
+        return {}
+
+    if columns is None:
+        columns = list(recent.keys())
+
+    return {col: [recent[col][i] for i in indices] for col in columns if col in recent}
@@ -0,0 +1,210 @@
+import os
+import csv
+import time
+import threading
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# --- CONFIGURATION ---
+LOCAL_OUTPUT_FOLDER = "forms_table_parquet"
+DROPBOX_OUTPUT_ROOT = "/Nizar/forms_table_parquet"
+DEFAULT_BUCKETS = 32
+FLUSH_ROWS = 250000          # Rows buffered per partition before a part file is written
+MANIFEST_NAME = "manifest.csv"
+
+DATE_COLUMNS = ["filingDate", "reportDate"]
+TIMESTAMP_COLUMNS = ["acceptanceDateTime"]
+INT_COLUMNS = ["size", "isXBRL", "isInlineXBRL"]
+
+
+def to_typed_13f(df_13f, cik_padded):
+    """
+    Same rows as the CSV tables, with real types instead of strings:
+    dates -> date, acceptanceDateTime -> timestamp, size/flags -> integers.
+    Adds a leading 'cik' column so many filers can share one file.
+    """
+    df = df_13f.copy()
+    for col in DATE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col].replace("", None), errors="coerce").dt.date
+    for col in TIMESTAMP_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col].replace("", None), errors="coerce", utc=True)
+    for col in INT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+    for col in df.columns:
+        if col not in DATE_COLUMNS + TIMESTAMP_COLUMNS + INT_COLUMNS:
+            df[col] = df[col].astype("string")
+    df.insert(0, "cik", cik_padded)
+    df["cik"] = df["cik"].astype("string")
+    return df
+
+
+def arrow_schema(df):
+    """
+    Explicit Arrow types for a to_typed_13f() frame. Inference alone depends on the data:
+    an all-empty date column comes out as timestamp instead of date32, so part files
+    (and the filers in them) would disagree on the schema.
+    """
+    fields = []
+    for col in df.columns:
+        if col in DATE_COLUMNS:
+            arrow_type = pa.date32()
+        elif col in TIMESTAMP_COLUMNS:
+            arrow_type = pa.timestamp("us", tz="UTC")
+        elif col in INT_COLUMNS:
+            arrow_type = pa.int64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(col, arrow_type))
+    return pa.schema(fields)
+
+
+class PartitionedTableWriter:
+    """
+    Collects per-CIK 13F tables and writes them as typed Parquet, many CIKs per file.
+
+    partition_by:
+      - "bucket": int(cik) % buckets   -> bucket=07/part-....parquet
+      - "year":   year of filingDate    -> year=2024/part-....parquet
+    Rows are sorted by CIK inside every file, and manifest.csv records
+    (cik, file, row_start, row_count) so a reader can pull one filer's rows directly.
+    Thread-safe, so the async fetcher's handler threads can share one writer.
+
+    Runs into the same folder only ever add part files: a CIK written again keeps its old
+    rows in the earlier files, and only manifest.csv points at the current ones. Read
+    through the manifest (read_cik_table), never the folder as a whole Parquet dataset,
+    which would return those CIKs twice.
+    """
+
+    def __init__(self, output_folder=LOCAL_OUTPUT_FOLDER, partition_by="bucket",
+                 buckets=DEFAULT_BUCKETS, flush_rows=FLUSH_ROWS):
+        if partition_by not in ("bucket", "year"):
+            raise ValueError("partition_by must be 'bucket' or 'year'")
+
+        self.output_folder = output_folder
+        self.partition_by = partition_by
+        self.buckets = buckets
+        self.flush_rows = flush_rows
+
+        self.run_id = time.strftime("%Y%m%d%H%M%S")
+        self._buffers = {}       # partition -> list of DataFrames
+        self._buffered_rows = {}
+        self._part_seq = 0
+        self._lock = threading.Lock()
+
+        self.manifest = []       # rows of manifest.csv
+        self.files_written = []  # relative paths of every part file
+
+    def _partitions_for(self, cik_padded, df):
+        if self.partition_by == "bucket":
+            return {f"bucket={int(cik_padded) % self.buckets:02d}": df}
+
+        years = pd.to_datetime(df["filingDate"], errors="coerce").dt.year
+        return {
+            f"year={int(year) if pd.notna(year) else 'unknown'}": part
+            for year, part in df.groupby(years, dropna=False)
+        }
+
+    def add(self, cik_padded, df_13f):
+        """Buffers one filer's 13F table. Returns the number of rows added."""
+        if df_13f.empty:
+            return 0
+
+        typed = to_typed_13f(df_13f, cik_padded)
+        with self._lock:
+            for partition, part in self._partitions_for(cik_padded, typed).items():
+                self._buffers.setdefault(partition, []).append(part)
+                self._buffered_rows[partition] = self._buffered_rows.get(partition, 0) + len(part)
+                if self._buffered_rows[partition] >= self.flush_rows:
+                    self._flush_partition(partition)
+        return len(typed)
+
+    def _flush_partition(self, partition):
+        frames = self._buffers.pop(partition, [])
+        self._buffered_rows.pop(partition, None)
+        if not frames:
+            return
+
+        df = pd.concat(frames, ignore_index=True)
+        df = df.sort_values(["cik", "filingDate"], kind="stable", na_position="last").reset_index(drop=True)
+
+        self._part_seq += 1
+        relative_path = f"{partition}/part-{self.run_id}-{self._part_seq:05d}.parquet"
+        local_path = os.path.join(self.output_folder, relative_path)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+
+        table = pa.Table.from_pandas(df, schema=arrow_schema(df), preserve_index=False)
+        pq.write_table(table, local_path, compression="zstd")
+        self.files_written.append(relative_path)
+
+        # Rows are sorted by CIK, so each filer is one contiguous range
+        ciks = df["cik"].tolist()
+        start = 0
+        for i in range(1, len(ciks) + 1):
+            if i == len(ciks) or ciks[i] != ciks[start]:
+                self.manifest.append({"cik": ciks[start], "file": relative_path, "row_start": start, "row_count": i - start})
+                start = i
+
+        print(f"  [Parquet] Wrote {relative_path} ({len(df)} rows)")
+
+    def close(self):
+        """
+        Writes any buffered rows plus manifest.csv. Returns the manifest path.
+        Entries from earlier runs are kept unless this run rewrote that CIK; the part files
+        holding its old rows stay on disk, so only manifest readers see a consistent table.
+        """
+        with self._lock:
+            for partition in list(self._buffers):
+                self._flush_partition(partition)
+
+            os.makedirs(self.output_folder, exist_ok=True)
+            manifest_path = os.path.join(self.output_folder, MANIFEST_NAME)
+            # Keep entries from earlier runs in the same folder, unless this run rewrote that CIK
+            previous = read_manifest(manifest_path) if os.path.exists(manifest_path) else []
+            rewritten = {entry["cik"] for entry in self.manifest}
+            previous = [entry for entry in previous if entry["cik"] not in rewritten]
+            with open(manifest_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=["cik", "file", "row_start", "row_count"])
+                writer.writeheader()
+                writer.writerows(previous + self.manifest)
+
+        print(f"[Parquet] {len(self.files_written)} files, {len(self.manifest)} manifest entries -> {manifest_path}")
+        return manifest_path
+
+    def upload(self, dbx_handler, dropbox_root=DROPBOX_OUTPUT_ROOT):
+        """Uploads this run's part files plus the manifest. Returns the number of failed uploads."""
+        failed = 0
+        for relative_path in self.files_written + [MANIFEST_NAME]:
+            with open(os.path.join(self.output_folder, relative_path), 'rb') as f:
+                if not dbx_handler.upload_stream(f, f"{dropbox_root}/{relative_path}"):
+                    failed += 1
+        print(f"[Parquet] Uploaded {len(self.files_written) + 1 - failed} files to {dropbox_root} ({failed} failed)")
+        return failed
+
+
+# ==========================================
+# READERS
+# ==========================================
+
+def read_manifest(manifest_path):
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return [
+            {"cik": row["cik"], "file": row["file"], "row_start": int(row["row_start"]), "row_count": int(row["row_count"])}
+            for row in csv.DictReader(f)
+        ]
+
+def read_cik_table(cik, output_folder=LOCAL_OUTPUT_FOLDER):
+    """
+    Loads one filer's 13F rows using the manifest (reads only the files that hold it).
+    This is the supported way to read the table; see PartitionedTableWriter.
+    """
+    cik_padded = str(int(cik)).zfill(10)
+    frames = []
+    for entry in read_manifest(os.path.join(output_folder, MANIFEST_NAME)):
+        if entry["cik"] == cik_padded:
+            table = pq.read_table(os.path.join(output_folder, entry["file"]))
+            frames.append(table.slice(entry["row_start"], entry["row_count"]).to_pandas())
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
@@ -23,10 +23,11 @@ def main():
         print("STARTING PARQUET INVENTORY SCAN")
         print("="*50 + "\n")
 
-        # Run the incremental scan
+        # Run the incremental scan (top-level folders listed in parallel)
         files = dbx_manager.get_parquet_files(
             folder_path=TARGET_FOLDER, 
-            output_csv=OUTPUT_FILE
+            output_csv=OUTPUT_FILE,
+            parallel=True
         )
 
         if files:
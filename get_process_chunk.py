@@ -1,6 +1,8 @@
 import csv
 import os
 from dropbox_ops import DropboxManager
+from catalog import Catalog
+from work_queue import WorkQueue, DEFAULT_QUEUE_PATH
 
 # --- CONFIGURATION ---
 APP_KEY = "dtm7p8v46wtwjh7"
@@ -9,11 +11,15 @@ INPUT_CSV = "drive_files.csv"
 DROPBOX_ROOT_PATH = "/Nizar/sec_forms"
 CHUNK_SIZE = 10000
 OUTPUT_FOLDER = "pending_chunks"
+CHUNK_FIELDS = ["folder_name", "file_name", "cik", "acsn", "fid", "size_bytes"]   # size_bytes: batch vs pipe in process_chunk.py
+USE_WORK_QUEUE = True    # Enqueue small leased tasks (process_chunk.py --queue) instead of writing chunk CSVs
+QUEUE_BATCH_SIZE = 200   # Rows per work queue task
 
-def build_dropbox_lookup(dropbox_mgr, root_path):
-    """Scans Dropbox to see what files already exist."""
+def build_dropbox_lookup(dropbox_mgr, root_path, catalog=None):
+    """Syncs the local Dropbox inventory (and the catalog's copy of it) to see what files already exist."""
     print("--- 1. Pre-scanning Dropbox state... ---")
-    metadata_list = dropbox_mgr.get_all_files_metadata(root_path, recursive=True)
+    # Incremental: only the changes since the last run are fetched (see DropboxManager.sync_inventory)
+    metadata_list = dropbox_mgr.sync_inventory(root_path, catalog=catalog).values()
     existing_files = set()
     
     for item in metadata_list:
@@ -33,24 +39,25 @@ def main():
         print(f"Initialization failed: {e}")
         return
 
-    # 2. Get existing files from Dropbox
-    existing_files_cache = build_dropbox_lookup(dbx, DROPBOX_ROOT_PATH)
+    catalog = Catalog()
 
-    # 3. Filter the main CSV
+    # 2. Bring the catalog's Dropbox side up to date
+    build_dropbox_lookup(dbx, DROPBOX_ROOT_PATH, catalog)
+
+    # 3. Load the Drive side, then let the catalog answer "what is missing"
     print(f"--- 2. Filtering {INPUT_CSV} ---")
-    files_to_upload = []
-    
     if not os.path.exists(INPUT_CSV):
         print(f"Error: {INPUT_CSV} not found.")
+        catalog.close()
         return
 
+    # The CSV is the current Drive listing: files gone from Drive must not be planned again
     with open(INPUT_CSV, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        fieldnames = reader.fieldnames
-        for row in reader:
-            unique_key = f"{row['folder_name']}/{row['file_name']}"
-            if unique_key not in existing_files_cache:
-                files_to_upload.append(row)
+        print(f"Loaded {catalog.replace_drive_files(csv.DictReader(f))} rows into the catalog.")
+
+    # Indexed anti-join on (folder_name, file_name) instead of a Python set over both CSVs
+    files_to_upload = catalog.missing_in_dropbox()
+    catalog.close()
 
     total_pending = len(files_to_upload)
     print(f"Total files needing upload: {total_pending}")
@@ -59,6 +66,14 @@ def main():
         print("Nothing to process.")
         return
 
+    if USE_WORK_QUEUE:
+        # Replaces the tasks nobody has claimed yet; running workers keep their leases
+        with WorkQueue(DEFAULT_QUEUE_PATH) as work_queue:
+            task_count = work_queue.enqueue(files_to_upload, QUEUE_BATCH_SIZE, replace=True)
+            print(f"Enqueued {task_count} tasks of up to {QUEUE_BATCH_SIZE} rows in {DEFAULT_QUEUE_PATH}: {work_queue.counts()}")
+        print("Start workers on any node with: python process_chunk.py --queue")
+        return
+
     # 4. Create Output Folder
     if not os.path.exists(OUTPUT_FOLDER):
         os.makedirs(OUTPUT_FOLDER)
@@ -74,7 +89,7 @@ def main():
         chunk_filename = os.path.join(OUTPUT_FOLDER, f"upload_chunk_{chunk_count}.csv")
         
         with open(chunk_filename, 'w', newline='', encoding='utf-8') as cf:
-            writer = csv.DictWriter(cf, fieldnames=fieldnames)
+            writer = csv.DictWriter(cf, fieldnames=CHUNK_FIELDS)
             writer.writeheader()
             writer.writerows(chunk)
             
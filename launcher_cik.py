@@ -30,9 +30,9 @@ def launch_workers(start_range, end_range):
         # Execute the command
         subprocess.Popen(command, shell=True)
 
-        # Wait 3 seconds before starting the next one.
-        # This prevents 11 windows from hitting the SEC server at the exact same millisecond.
-        time.sleep(3)
+        # Short stagger so the windows don't all start at once.
+        # Request pacing itself is handled by the shared limiter in sec_rate_limiter.py.
+        time.sleep(1)
 
 if __name__ == "__main__":
     # --- CONFIGURATION ---
@@ -1,9 +1,10 @@
 import csv
 import os
 import time
-import random
 from drive_ops import GoogleDriveManager
-from dropbox_ops import DropboxManager
+from dropbox_ops import DropboxManager, SESSION_CHUNK_SIZE
+from adaptive_concurrency import retry_delay
+from migration_state import MigrationState
 import datetime
 # --- CONFIGURATION ---
 APP_KEY = "dtm7p8v46wtwjh7"
@@ -12,11 +13,13 @@ DROPBOX_TOKEN = "sl.u.AGIZbCsi7UBdGMUF4Z_OSq527MHzQg-ADax0IkMrPxYzuqb1AENghXF9me
 INPUT_CSV = "drive_files.csv"
 ERROR_LOG_CSV = "migration_failed.csv"
 DROPBOX_ROOT_PATH = "/Nizar/sec_forms"
+UPLOAD_BATCH_SIZE = 50   # Files committed together with DropboxManager.upload_many
 
 def build_dropbox_lookup(dropbox_mgr, root_path):
-    """Scans Dropbox ONCE to see what files and folders already exist."""
+    """Syncs the local Dropbox inventory ONCE to see what files and folders already exist."""
     print("--- 1. Pre-scanning Dropbox state... ---")
-    metadata_list = dropbox_mgr.get_all_files_metadata(root_path, recursive=True)
+    # Incremental: only the changes since the last run are fetched (see DropboxManager.sync_inventory)
+    metadata_list = dropbox_mgr.sync_inventory(root_path).values()
     existing_files = set()
     existing_folders = set()
     
@@ -33,21 +36,14 @@ def build_dropbox_lookup(dropbox_mgr, root_path):
 def transfer_file_with_retry(drive, dropbox, file_id, target_path, max_retries=3):
     """Attempts to stream download + upload with retries."""
     for attempt in range(1, max_retries + 1):
+        file_stream = None
         try:
-            # 1. Get Stream from Google
-            # We fetch a FRESH stream every attempt
-            file_stream = drive.get_file_stream(file_id)
-            
-            if not file_stream:
-                print(f"    [Attempt {attempt}] Google Drive returned empty stream.")
-                time.sleep(2)
-                continue
+            # 1. Open a pipe from Google (download runs in the background)
+            # We open a FRESH pipe every attempt
+            file_stream = drive.open_file_pipe(file_id)
 
-            # 2. Upload Stream to Dropbox
-            result = dropbox.upload_stream(file_stream, target_path)
-            
-            # Close stream to free memory
-            file_stream.close()
+            # 2. Upload from the pipe to Dropbox while it downloads, one chunk at a time
+            result = dropbox.upload_stream(file_stream, target_path, session_threshold=SESSION_CHUNK_SIZE)
 
             if result:
                 return True
@@ -56,12 +52,70 @@ def transfer_file_with_retry(drive, dropbox, file_id, target_path, max_retries=3
 
         except Exception as e:
             print(f"    [Attempt {attempt}] Error: {str(e)}")
-            # Exponential Backoff: Wait 2s, then 4s, then 6s... + random jitter
-            sleep_time = (attempt * 2) + random.uniform(0.1, 1.0)
-            time.sleep(sleep_time)
+            # Rate limits: exactly the Retry-After the service sent. Otherwise 2s, 4s, 6s... + jitter
+            time.sleep(retry_delay(attempt, e))
+        finally:
+            # Stops the download thread if the upload gave up early
+            if file_stream:
+                file_stream.close()
             
     return False
 
+def fits_batch(row):
+    """
+    True if the row's size_bytes says the file fits in one upload chunk. Larger files and
+    rows without a size go through the single-file (pipe) path instead of being buffered whole.
+    """
+    try:
+        return int(row['size_bytes']) <= SESSION_CHUNK_SIZE
+    except (KeyError, TypeError, ValueError):
+        return False
+
+def transfer_batch(drive, dropbox, pending):
+    """
+    pending: list of (file_id, target_path, row).
+    Downloads every file that fits_batch, commits them with ONE upload_many call, and sends
+    the rest, plus anything that failed, through the single-file path.
+    Returns a list of (row, success) in the same order.
+    """
+    items = []
+    uploaded_rows = []
+    retry = [task for task in pending if not fits_batch(task[2])]
+    for file_id, target_path, row in pending:
+        if not fits_batch(row):
+            continue
+        try:
+            file_stream = drive.get_file_stream(file_id)
+        except Exception as e:
+            print(f"    Download failed for {row['file_name']}: {e}")
+            file_stream = None
+        if file_stream:
+            items.append((file_stream, target_path))
+            uploaded_rows.append((file_id, target_path, row))
+        else:
+            retry.append((file_id, target_path, row))
+
+    outcome = {}
+    if items:
+        try:
+            results = dropbox.upload_many(items)
+        except Exception as e:
+            print(f"    Batch upload error: {e}")
+            results = [{"success": False, "error": str(e)} for _ in items]
+        for (file_id, target_path, row), result in zip(uploaded_rows, results):
+            if result["success"]:
+                outcome[target_path] = True
+            else:
+                print(f"    Batch upload failed for {row['file_name']}: {result['error']}")
+                retry.append((file_id, target_path, row))
+        for file_stream, _ in items:
+            file_stream.close()
+
+    for file_id, target_path, row in retry:
+        outcome[target_path] = transfer_file_with_retry(drive, dropbox, file_id, target_path)
+
+    return [(row, outcome[target_path]) for _, target_path, row in pending]
+
 def main():
     # 1. Initialize Managers
     try:
@@ -82,6 +136,8 @@ def main():
     fail_count = 0
     
     error_file_exists = os.path.exists(ERROR_LOG_CSV)
+    # Per-file state (pending / in_flight / done / failed) for migration_state.py resume
+    state = MigrationState()
     
     try:
         with open(INPUT_CSV, 'r', encoding='utf-8') as f:
@@ -97,6 +153,41 @@ def main():
             if not error_file_exists:
                 err_writer.writeheader()
 
+            pending = []
+
+            def flush_pending():
+                nonlocal success_count, fail_count
+                print(f"  -> Transferring batch of {len(pending)}...")
+                reason = "Transfer failed after retries"
+                try:
+                    try:
+                        state.started(pending)
+                        outcomes = transfer_batch(drive, dbx, pending)
+                    except Exception as e:
+                        # Not a per-file failure: fail the whole batch rather than carry it into the next one
+                        print(f"  -> BATCH ERROR: {e}")
+                        reason = str(e)
+                        outcomes = [(batch_row, False) for _, _, batch_row in pending]
+
+                    succeeded = []
+                    failed = []
+                    for batch_row, ok in outcomes:
+                        unique_key = f"{batch_row['folder_name']}/{batch_row['file_name']}"
+                        if ok:
+                            existing_files_cache.add(unique_key)
+                            succeeded.append(batch_row)
+                            success_count += 1
+                        else:
+                            print(f"  -> FAILED: {unique_key} ({reason})")
+                            batch_row['error_reason'] = reason
+                            err_writer.writerow(batch_row)
+                            failed.append(batch_row)
+                            fail_count += 1
+                    state.succeeded(succeeded)
+                    state.failed(failed)
+                finally:
+                    pending.clear()
+
             # Step B: Record Start Time
             start_time = time.time()
 
@@ -135,28 +226,30 @@ def main():
                         dbx.create_folder(target_folder_path)
                         existing_folders_cache.add(folder_name)
                     
-                    # --- ACTION: Transfer with Retry ---
-                    print(f"  -> Transferring...")
-                    if transfer_file_with_retry(drive, dbx, file_id, target_file_path):
-                        print(f"  -> SUCCESS")
-                        existing_files_cache.add(unique_key)
-                        success_count += 1
-                    else:
-                        print(f"  -> FAILED after retries")
-                        row['error_reason'] = "Transfer failed after retries"
-                        err_writer.writerow(row)
-                        fail_count += 1
+                    # --- ACTION: Queue for the next batch commit ---
+                    pending.append((file_id, target_file_path, row))
 
                 except Exception as e:
                     print(f"  -> UNEXPECTED ERROR: {e}")
                     row['error_reason'] = str(e)
                     err_writer.writerow(row)
+                    state.failed([row])
                     fail_count += 1
+
+                # Outside the per-row try: a batch error must not be blamed on (and counted for) this row only
+                if len(pending) >= UPLOAD_BATCH_SIZE:
+                    flush_pending()
+
+            # Last partial batch
+            if pending:
+                flush_pending()
                     
     except FileNotFoundError:
         print(f"Error: Could not find file {INPUT_CSV}")
     except KeyboardInterrupt:
         print("\nScript stopped by user.")
+    finally:
+        state.close()
 
     print("\n--- Migration Summary ---")
     print(f"Transferred: {success_count}")
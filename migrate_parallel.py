@@ -1,12 +1,14 @@
 import csv
 import os
 import time
-import random
+import queue
 import threading
 from pprint import pprint
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from drive_ops import GoogleDriveManager
-from dropbox_ops import DropboxManager
+from dropbox_ops import DropboxManager, SESSION_CHUNK_SIZE
+from client_pool import ClientPool
+from adaptive_concurrency import AdaptiveConcurrency, retry_delay
+from migration_state import MigrationState
 
 # --- CONFIGURATION ---
 APP_KEY = "dtm7p8v46wtwjh7"
@@ -15,12 +17,18 @@ INPUT_CSV = "drive_files.csv"
 DROPBOX_ROOT_PATH = "/Nizar/sec_forms"
 
 # THREADING CONFIG
-BATCH_SIZE = 100  
-MAX_WORKERS = 10  
+BATCH_SIZE = 100            # Files per upload_many commit
+MAX_WORKERS = 32            # Long-lived download workers = ceiling for the adaptive in-flight limit
+INITIAL_IN_FLIGHT = 8       # Starting AIMD limit; grows while requests succeed, halves on 429s
+MAX_IN_FLIGHT = 200         # Downloaded files allowed to wait for the uploader (bounds memory)
+UPLOAD_FLUSH_SECONDS = 2.0  # Commit a partial batch once nothing new arrived for this long
+BATCHED_UPLOADS = True      # Commit with upload_many instead of one files_upload per file
 
 # --- GLOBAL CLIENTS ---
-DRIVE_CLIENT = None
+DRIVE_CLIENT = None   # Main thread only (listing, folder setup)
 DBX_CLIENT = None
+CLIENTS = None        # ClientPool: worker threads take their own clients from here
+CONCURRENCY = None    # AdaptiveConcurrency: how many of the workers may transfer right now
 
 # Stats
 success_count = 0
@@ -28,9 +36,10 @@ fail_count = 0
 processed_in_session = 0
 
 def build_dropbox_lookup(dropbox_mgr, root_path):
-    """Scans Dropbox ONCE to see what files and folders already exist."""
+    """Syncs the local Dropbox inventory ONCE to see what files and folders already exist."""
     print("--- 1. Pre-scanning Dropbox state... ---")
-    metadata_list = dropbox_mgr.get_all_files_metadata(root_path, recursive=True)
+    # Incremental: only the changes since the last run are fetched (see DropboxManager.sync_inventory)
+    metadata_list = dropbox_mgr.sync_inventory(root_path).values()
     existing_files = set()
     existing_folders = set()
     
@@ -46,41 +55,246 @@ def build_dropbox_lookup(dropbox_mgr, root_path):
 
 def transfer_file_worker(file_id, target_path, row_data, max_retries=3):
     """
-    Uses global DRIVE_CLIENT and DBX_CLIENT to transfer files.
+    Uses this thread's clients from the global CLIENTS pool to transfer files.
+    The download is piped straight into the Dropbox upload session, chunk by chunk.
+    Each attempt holds one CONCURRENCY slot; rate limits wait exactly the Retry-After.
     Returns (success_boolean, row_data, error_message)
     """
     for attempt in range(1, max_retries + 1):
+        file_stream = None
         try:
-            file_stream = DRIVE_CLIENT.get_file_stream(file_id)
-            if not file_stream:
-                time.sleep(1)
-                continue
-
-            result = DBX_CLIENT.upload_stream(file_stream, target_path)
-            
-            if hasattr(file_stream, 'close'):
-                file_stream.close()
+            with CONCURRENCY.slot():
+                # num_retries=0: 429s reach CONCURRENCY instead of being slept through per chunk
+                file_stream = CLIENTS.drive().open_file_pipe(file_id, num_retries=0)
+                result = CLIENTS.dropbox().upload_stream(file_stream, target_path, session_threshold=SESSION_CHUNK_SIZE)
 
             if result:
+                CONCURRENCY.on_success()
                 print(f"    [Attempt {attempt}] Uploaded successfully.")
                 return True, row_data, None
             
         except Exception as e:
-            time.sleep((attempt * 2) + random.uniform(0.1, 1.0))
+            CONCURRENCY.report(e)
             if attempt == max_retries:
                 return False, row_data, str(e)
+            time.sleep(retry_delay(attempt, e))
+        finally:
+            if file_stream:
+                file_stream.close()
             
     return False, row_data, "Max retries reached or empty stream"
 
-def main():
-    global DRIVE_CLIENT, DBX_CLIENT, success_count, fail_count, processed_in_session
+def download_file_worker(file_id, row_data, max_retries=3):
+    """
+    Downloads one file from Drive for a batched upload.
+    Returns (file_stream_or_None, row_data, error_message)
+    """
+    for attempt in range(1, max_retries + 1):
+        try:
+            with CONCURRENCY.slot():
+                file_stream = CLIENTS.drive().get_file_stream(file_id)
+            if file_stream:
+                CONCURRENCY.on_success()
+                return file_stream, row_data, None
+            time.sleep(1)
+        except Exception as e:
+            CONCURRENCY.report(e)
+            if attempt == max_retries:
+                return None, row_data, str(e)
+            time.sleep(retry_delay(attempt, e))
+    return None, row_data, "Max retries reached or empty stream"
 
-    # 1. Initialize Global Managers
+def file_size(row_data):
+    """Bytes from the listing's size_bytes column, or None if the row has no usable size."""
+    try:
+        return int(row_data['size_bytes'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+class TransferPipeline:
+    """
+    Continuous transfer pipeline with long-lived workers (no per-batch barrier):
+
+        feeder -> task_queue -> MAX_WORKERS download workers
+               -> upload_queue (at most MAX_IN_FLIGHT files) -> batch uploader (upload_many)
+        files over SESSION_CHUNK_SIZE (or of unknown size) -> transfer_file_worker (single-file pipe)
+        files that fail either stage -> retry_queue -> transfer_file_worker
+        every outcome -> result_queue -> run()
+
+    A slow file only occupies its own worker; everyone else keeps pulling tasks.
+    Only small files are buffered whole, so MAX_IN_FLIGHT bounds memory to about
+    MAX_IN_FLIGHT * SESSION_CHUNK_SIZE.
+    state: optional MigrationState; the feeder marks tasks in_flight as it hands them out.
+    """
+
+    def __init__(self, tasks, workers=MAX_WORKERS, max_in_flight=MAX_IN_FLIGHT, batched=BATCHED_UPLOADS, state=None):
+        self.tasks = list(tasks)
+        self.workers = workers
+        self.batched = batched
+        self.state = state
+        self.task_queue = queue.Queue(maxsize=workers * 2)
+        self.upload_queue = queue.Queue(maxsize=max_in_flight)
+        self.retry_queue = queue.Queue()
+        self.result_queue = queue.Queue()
+
+    def _feed(self):
+        for i in range(0, len(self.tasks), BATCH_SIZE):
+            group = self.tasks[i : i + BATCH_SIZE]
+            if self.state:
+                # One write per group; a crash leaves these in_flight for migration_state.py resume
+                self.state.started(group)
+            for task in group:
+                self.task_queue.put((False, task))
+
+    def _next_task(self):
+        # Retries first, so they are not stuck behind the rest of the backlog
+        while True:
+            try:
+                return self.retry_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                return self.task_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+
+    def _download_worker(self):
+        while True:
+            item = self._next_task()
+            if item is None:
+                return
+            is_retry, (file_id, target_path, row_data) = item
+
+            if is_retry or not self.batched or not self._fits_batch(row_data):
+                self.result_queue.put(transfer_file_worker(file_id, target_path, row_data))
+                continue
+
+            file_stream, _, _ = download_file_worker(file_id, row_data)
+            if file_stream:
+                # Blocks while MAX_IN_FLIGHT files are already waiting for the uploader
+                self.upload_queue.put((file_stream, target_path, (file_id, target_path, row_data)))
+            else:
+                self.retry_queue.put((True, (file_id, target_path, row_data)))
+
+    @staticmethod
+    def _fits_batch(row_data):
+        """
+        Small enough to buffer in memory for upload_many; larger files stream through a pipe.
+        Unknown sizes take the pipe too, rather than one Drive metadata request per row.
+        """
+        size = file_size(row_data)
+        return size is not None and size <= SESSION_CHUNK_SIZE
+
+    def _commit(self, batch):
+        if not batch:
+            return
+        try:
+            # Session uploads follow the current AIMD limit; 429s inside sessions are reported via CLIENTS
+            results = CLIENTS.dropbox().upload_many([(stream, path) for stream, path, _ in batch],
+                                                    max_workers=int(CONCURRENCY.limit))
+        except Exception as e:
+            CONCURRENCY.report(e)
+            print(f"    Batch upload error: {e}")
+            results = [{"success": False, "error": str(e)} for _ in batch]
+
+        for (file_stream, _, task), result in zip(batch, results):
+            file_stream.close()
+            if result["success"]:
+                self.result_queue.put((True, task[2], None))
+            else:
+                self.retry_queue.put((True, task))
+
+    def _upload_worker(self):
+        batch = []
+        while True:
+            try:
+                item = self.upload_queue.get(timeout=UPLOAD_FLUSH_SECONDS)
+            except queue.Empty:
+                self._commit(batch)
+                batch = []
+                continue
+            if item is None:
+                self._commit(batch)
+                return
+            batch.append(item)
+            if len(batch) >= BATCH_SIZE:
+                self._commit(batch)
+                batch = []
+
+    def run(self):
+        """Yields (success_boolean, row_data, error_message) for every task, in completion order."""
+        threads = [threading.Thread(target=self._feed, daemon=True)]
+        threads += [threading.Thread(target=self._download_worker, daemon=True) for _ in range(self.workers)]
+        if self.batched:
+            threads.append(threading.Thread(target=self._upload_worker, daemon=True))
+        for t in threads:
+            t.start()
+
+        for _ in range(len(self.tasks)):
+            yield self.result_queue.get()
+
+        # Every task has an outcome, so the workers are idle: shut them down
+        for _ in range(self.workers):
+            self.task_queue.put(None)
+        self.upload_queue.put(None)
+        for t in threads:
+            t.join()
+
+def init_clients():
+    """Creates the global clients, pool and concurrency controller. Returns False on failure."""
+    global DRIVE_CLIENT, DBX_CLIENT, CLIENTS, CONCURRENCY
     try:
         DRIVE_CLIENT = GoogleDriveManager()
         DBX_CLIENT = DropboxManager(APP_KEY, APP_SECRET)
+        CONCURRENCY = AdaptiveConcurrency(initial=INITIAL_IN_FLIGHT, max_limit=MAX_WORKERS)
+        CLIENTS = ClientPool(DRIVE_CLIENT, DBX_CLIENT, dropbox_connections=MAX_WORKERS,
+                             on_rate_limit=CONCURRENCY.on_rate_limit)
+        return True
     except Exception as e:
         print(f"Initialization failed: {e}")
+        return False
+
+def run_transfers(tasks, state=None):
+    """
+    Streams (file_id, target_path, row) tasks through the pipeline and prints every outcome.
+    state: optional MigrationState that records in_flight / done / failed per file.
+    """
+    global success_count, fail_count, processed_in_session
+    total_to_process = len(tasks)
+
+    for is_success, row_data, error_msg in TransferPipeline(tasks, state=state).run():
+        processed_in_session += 1
+        
+        if is_success:
+            success_count += 1
+            if state:
+                state.succeeded([row_data])
+            print(f"[{processed_in_session}/{total_to_process}] SUCCESS: {row_data['file_name']}")
+        else:
+            fail_count += 1
+            if state:
+                state.failed([row_data], error_msg or "Transfer failed after retries")
+            print(f"\n{'!'*20} TRANSFER FAILED {'!'*20}")
+            pprint({
+                "file": row_data['file_name'],
+                "folder": row_data['folder_name'],
+                "fid": row_data['fid'],
+                "error": error_msg
+            })
+            print(f"{'!'*56}\n")
+
+def print_summary(start_time):
+    duration = int(time.time() - start_time)
+    print("\n--- Migration Summary ---")
+    print(f"Total Processed: {processed_in_session}")
+    print(f"Success:         {success_count}")
+    print(f"Failed:          {fail_count}")
+    print(f"Time Taken:      {duration // 60}m {duration % 60}s")
+    print(f"Rate Limited:    {CONCURRENCY.rate_limited} (final in-flight limit {int(CONCURRENCY.limit)})")
+
+def main():
+    # 1. Initialize Global Managers
+    if not init_clients():
         return
 
     # 2. Build Cache
@@ -127,41 +341,13 @@ def main():
     print(f"Items to transfer: {total_to_process}\n")
     start_time = time.time()
 
-    # 4. Process in batches of 100
-    for i in range(0, total_to_process, BATCH_SIZE):
-        chunk = all_pending_tasks[i : i + BATCH_SIZE]
-        
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            future_to_task = {
-                executor.submit(transfer_file_worker, tid, tpath, trow): trow 
-                for tid, tpath, trow in chunk
-            }
-            
-            for future in as_completed(future_to_task):
-                is_success, row_data, error_msg = future.result()
-                processed_in_session += 1
-                
-                if is_success:
-                    success_count += 1
-                    print(f"[{processed_in_session}/{total_to_process}] SUCCESS: {row_data['file_name']}")
-                else:
-                    fail_count += 1
-                    print(f"\n{'!'*20} TRANSFER FAILED {'!'*20}")
-                    pprint({
-                        "file": row_data['file_name'],
-                        "folder": row_data['folder_name'],
-                        "fid": row_data['fid'],
-                        "error": error_msg
-                    })
-                    print(f"{'!'*56}\n")
+    # 4. Record the work, then stream every task through the pipeline
+    with MigrationState() as state:
+        state.queued(all_pending_tasks)
+        run_transfers(all_pending_tasks, state)
 
     # Final Summary
-    duration = int(time.time() - start_time)
-    print("\n--- Migration Summary ---")
-    print(f"Total Processed: {processed_in_session}")
-    print(f"Success:         {success_count}")
-    print(f"Failed:          {fail_count}")
-    print(f"Time Taken:      {duration // 60}m {duration % 60}s")
+    print_summary(start_time)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,165 @@
+import os
+import csv
+import time
+import argparse
+
+from catalog import Catalog, DEFAULT_CATALOG_PATH, MIGRATION_FAILED_CSV
+
+# --- STATES ---
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+RESUMABLE_STATES = (PENDING, IN_FLIGHT, FAILED)
+
+# --- CONFIGURATION ---
+DROPBOX_ROOT_PATH = "/Nizar/sec_forms"
+IN_FLIGHT_STALE_MINUTES = 60   # Younger in_flight rows may belong to a run that is still going
+
+
+class MigrationState:
+    """
+    Durable per-file migration state, stored in the catalog's migration_state table:
+
+        pending -> in_flight -> done
+                            \\-> failed (attempts + 1, last_error) -> in_flight -> ...
+
+    Every migration script records its transitions here. After a crash or a stop,
+    resumable() returns exactly the files that never reached 'done', so a restart
+    needs no Drive or Dropbox listing.
+    Tasks are the usual (file_id, target_path, row) tuples.
+    """
+
+    def __init__(self, catalog=None):
+        self._owns_catalog = catalog is None
+        self.catalog = catalog or Catalog()
+
+    def close(self):
+        if self._owns_catalog:
+            self.catalog.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _task_rows(tasks):
+        for file_id, target_path, row in tasks:
+            yield {"fid": file_id, "folder_name": row['folder_name'], "file_name": row['file_name'],
+                   "target_path": target_path}
+
+    # ==========================================
+    # 1. TRANSITIONS
+    # ==========================================
+
+    def queued(self, tasks):
+        return self.catalog.set_migration_state(self._task_rows(tasks), PENDING)
+
+    def started(self, tasks):
+        return self.catalog.set_migration_state(self._task_rows(tasks), IN_FLIGHT)
+
+    def succeeded(self, rows):
+        """rows: the task rows (need fid, folder_name, file_name)."""
+        return self.catalog.set_migration_state(rows, DONE)
+
+    def failed(self, rows, error=None):
+        return self.catalog.set_migration_state(rows, FAILED, error)
+
+    # ==========================================
+    # 2. RESUME / REPLAY
+    # ==========================================
+
+    def resumable(self, root_path=DROPBOX_ROOT_PATH, states=RESUMABLE_STATES, folder_name=None, max_attempts=None,
+                  stale_minutes=IN_FLIGHT_STALE_MINUTES):
+        """
+        Tasks for every file left in `states` (default: pending, in_flight, failed).
+        in_flight files are only taken once they sat unchanged for `stale_minutes` (the run
+        that started them is presumed dead); 0 takes them all.
+        """
+        in_flight_before = time.time() - stale_minutes * 60 if stale_minutes else None
+        tasks = []
+        for row in self.catalog.migration_rows(states, folder_name, max_attempts, in_flight_before):
+            # Rows imported from migration_failed.csv have no target path yet
+            target_path = row['target_path'] or f"{root_path}/{row['folder_name']}/{row['file_name']}"
+            tasks.append((row['fid'], target_path, row))
+        return tasks
+
+    def replay_tasks(self, csv_path=MIGRATION_FAILED_CSV, root_path=DROPBOX_ROOT_PATH):
+        """
+        Tasks for the rows of a failure log (migration_failed.csv), skipping files already
+        'done' and duplicate rows. The rows are recorded as pending.
+        """
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            rows = {row['fid']: row for row in csv.DictReader(f) if row.get('fid')}
+        for row in rows.values():
+            # The old reason would otherwise win over the new error if the replay fails too
+            row.pop('error_reason', None)
+
+        done = {fid for fid, state in self.catalog.migration_states_for(rows).items() if state == DONE}
+        tasks = [
+            (fid, f"{root_path}/{row['folder_name']}/{row['file_name']}", row)
+            for fid, row in rows.items() if fid not in done
+        ]
+        self.queued(tasks)
+        print(f"{csv_path}: {len(rows)} files, {len(done)} already done, {len(tasks)} to replay")
+        return tasks
+
+
+# ==========================================
+# 3. CLI
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-file migration state: status, resume and replay of failures.")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Files per state")
+    resume = sub.add_parser("resume", help="Re-run pending, in-flight and failed files (no listing)")
+    resume.add_argument("--folder", default=None, help="Only this quarter folder, e.g. 2025_09_30")
+    resume.add_argument("--max-attempts", type=int, default=None, help="Skip files that already failed this often")
+    resume.add_argument("--failed-only", action="store_true", help="Leave pending/in-flight files alone")
+    resume.add_argument("--stale-minutes", type=float, default=IN_FLIGHT_STALE_MINUTES,
+                        help="Only resume in-flight files untouched for this long (0 = all of them)")
+    replay = sub.add_parser("replay", help="Re-run the rows of a failure CSV")
+    replay.add_argument("csv", nargs="?", default=MIGRATION_FAILED_CSV)
+    args = parser.parse_args()
+
+    with Catalog(args.catalog) as catalog:
+        state = MigrationState(catalog)
+        if args.command == "status":
+            print(f"Migration states: {state.catalog.migration_counts()}")
+            return
+
+        if args.command == "resume":
+            states = (FAILED,) if args.failed_only else RESUMABLE_STATES
+            tasks = state.resumable(states=states, folder_name=args.folder, max_attempts=args.max_attempts,
+                                    stale_minutes=args.stale_minutes)
+        else:
+            if not os.path.exists(args.csv):
+                print(f"File {args.csv} not found.")
+                return
+            tasks = state.replay_tasks(args.csv)
+
+        if not tasks:
+            print("Nothing to do.")
+            return
+
+        # Same workers as migrate_parallel.py; uploads create missing parent folders themselves.
+        # Imported here: migrate_parallel imports this module, and `python migrate_parallel.py`
+        # would otherwise load a second copy of it as "migrate_parallel" next to "__main__".
+        import migrate_parallel
+        if not migrate_parallel.init_clients():
+            return
+        start_time = time.time()
+        migrate_parallel.run_transfers(tasks, state)
+        migrate_parallel.print_summary(start_time)
+        print(f"Migration states: {state.catalog.migration_counts()}")
+
+if __name__ == "__main__":
+    main()
+
+# python migration_state.py status
+# python migration_state.py resume --max-attempts 5
+# python migration_state.py replay migration_failed.csv
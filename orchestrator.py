@@ -0,0 +1,273 @@
+import os
+import sys
+import glob
+import time
+import queue
+import argparse
+import multiprocessing as mp
+
+# --- CONFIGURATION ---
+DEFAULT_WORKERS = os.cpu_count() or 4
+MAX_ATTEMPTS_PER_CHUNK = 3    # A chunk that crashes its worker this many times is given up
+REPORT_EVERY_SECONDS = 10
+LOG_FOLDER = "worker_logs"
+
+# job name -> (default chunk glob, short description)
+JOBS = {
+    "cik": ("cik_chunks/cik_data_part_*.json", "process_cik_chunk: SEC submissions -> 13F counts"),
+    "migrate": ("pending_chunks/upload_chunk_*.csv", "process_chunk: Google Drive -> Dropbox"),
+}
+
+
+# ==========================================
+# 1. WORKER PROCESS
+# ==========================================
+
+def _setup_job(job):
+    """Imports the job module inside the worker and returns run(chunk_path, attempt, progress)."""
+    if job == "cik":
+        import process_cik_chunk
+
+        def run(chunk_path, attempt, progress):
+            # A retried chunk picks up from its journal instead of starting over
+            return process_cik_chunk.run_chunk(chunk_path, resume=attempt > 1, progress=progress)
+        return run
+
+    import process_chunk
+    # One set of clients per worker process, reused for every chunk it handles
+    process_chunk.init_clients()
+
+    def run(chunk_path, attempt, progress):
+        return process_chunk.run_chunk(chunk_path, progress=progress)
+    return run
+
+def _worker_main(worker_id, job, task_queue, event_queue):
+    """
+    Pulls chunks from the shared queue until it receives None.
+    The worker's own prints go to worker_logs/<job>_worker_<id>.log; the
+    orchestrator only sees the structured events.
+    """
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+    log_file = open(os.path.join(LOG_FOLDER, f"{job}_worker_{worker_id}.log"), 'a', buffering=1, encoding='utf-8')
+    sys.stdout = log_file
+    sys.stderr = log_file
+
+    run = _setup_job(job)
+
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+
+        chunk_path, attempt = task
+        event_queue.put(("start", worker_id, chunk_path, attempt))
+
+        last_report = [0.0]
+
+        def progress(done, total, success, failed):
+            # Throttle to a few events per second per worker
+            now = time.time()
+            if now - last_report[0] >= 1.0 or done == total:
+                last_report[0] = now
+                event_queue.put(("progress", worker_id, chunk_path, done, total, success, failed))
+
+        try:
+            summary = run(chunk_path, attempt, progress)
+            event_queue.put(("done", worker_id, chunk_path, summary))
+        except Exception as e:
+            # Recoverable error: report it and keep serving the queue
+            print(f"Chunk {chunk_path} failed: {e}")
+            event_queue.put(("error", worker_id, chunk_path, attempt, str(e)))
+
+
+# ==========================================
+# 2. ORCHESTRATOR
+# ==========================================
+
+class Orchestrator:
+    """
+    Runs chunk files through a fixed-size pool of worker processes.
+
+    - One shared work queue: an idle worker immediately takes the next chunk.
+    - Crashed workers are replaced and their chunk is re-queued (up to MAX_ATTEMPTS_PER_CHUNK).
+    - A single combined progress line replaces N separate PowerShell windows.
+    """
+
+    def __init__(self, job, chunk_paths, workers=DEFAULT_WORKERS, max_attempts=MAX_ATTEMPTS_PER_CHUNK):
+        self.job = job
+        self.chunk_paths = list(chunk_paths)
+        self.num_workers = max(1, min(workers, len(self.chunk_paths)))
+        self.max_attempts = max_attempts
+
+        ctx = mp.get_context("spawn")
+        self.ctx = ctx
+        self.task_queue = ctx.Queue()
+        self.event_queue = ctx.Queue()
+
+        self.processes = {}        # worker_id -> Process
+        self.current = {}          # worker_id -> (chunk_path, attempt)
+        self.progress = {}         # chunk_path -> (done, total, success, failed)
+        self.finished = {}         # chunk_path -> summary
+        self.given_up = {}         # chunk_path -> last error
+        self.restarts = 0
+        self.max_restarts = max_attempts * len(self.chunk_paths) + self.num_workers
+        self.next_worker_id = 0
+
+    def _start_worker(self):
+        worker_id = self.next_worker_id
+        self.next_worker_id += 1
+        p = self.ctx.Process(target=_worker_main, args=(worker_id, self.job, self.task_queue, self.event_queue),
+                             name=f"{self.job}-worker-{worker_id}")
+        p.start()
+        self.processes[worker_id] = p
+
+    def _retry_or_give_up(self, chunk_path, attempt, error):
+        if attempt < self.max_attempts:
+            print(f"[Orchestrator] Re-queueing {chunk_path} (attempt {attempt + 1}/{self.max_attempts}): {error}")
+            self.task_queue.put((chunk_path, attempt + 1))
+        else:
+            print(f"[Orchestrator] Giving up on {chunk_path}: {error}")
+            self.given_up[chunk_path] = error
+
+    def _handle_event(self, event):
+        kind, worker_id, chunk_path = event[0], event[1], event[2]
+
+        if kind == "start":
+            self.current[worker_id] = (chunk_path, event[3])
+        elif kind == "progress":
+            self.progress[chunk_path] = event[3:]
+        elif kind == "done":
+            self.current.pop(worker_id, None)
+            self.finished[chunk_path] = event[3]
+            print(f"[Orchestrator] Finished {chunk_path}: {event[3]}")
+        elif kind == "error":
+            self.current.pop(worker_id, None)
+            self._retry_or_give_up(chunk_path, event[3], event[4])
+
+    def _drain_events(self, timeout):
+        try:
+            self._handle_event(self.event_queue.get(timeout=timeout))
+            while True:
+                self._handle_event(self.event_queue.get_nowait())
+        except queue.Empty:
+            pass
+
+    def _check_workers(self):
+        """Replaces dead workers and re-queues whatever chunk they were holding."""
+        for worker_id, p in list(self.processes.items()):
+            if p.is_alive():
+                continue
+
+            # Collect any events it sent right before dying
+            self._drain_events(timeout=0.1)
+            del self.processes[worker_id]
+
+            task = self.current.pop(worker_id, None)
+            if task is None and p.exitcode == 0:
+                continue  # Clean exit after the shutdown sentinel
+
+            self.restarts += 1
+            print(f"[Orchestrator] Worker {worker_id} died (exit code {p.exitcode}). Restarting...")
+            if task:
+                self._retry_or_give_up(task[0], task[1], f"worker exit code {p.exitcode}")
+
+            if self.restarts > self.max_restarts:
+                # Workers die before taking any chunk (e.g. bad credentials): stop instead of looping
+                raise RuntimeError(f"Too many worker restarts ({self.restarts}); check {LOG_FOLDER}/")
+            if self._outstanding() > 0:
+                self._start_worker()
+
+    def _outstanding(self):
+        return len(self.chunk_paths) - len(self.finished) - len(self.given_up)
+
+    def _report(self, start_time):
+        done = sum(p[0] for p in self.progress.values())
+        total = sum(p[1] for p in self.progress.values())
+        success = sum(p[2] for p in self.progress.values())
+        failed = sum(p[3] for p in self.progress.values())
+        elapsed = max(time.time() - start_time, 1e-6)
+        print(f"[Progress] chunks {len(self.finished)}/{len(self.chunk_paths)} "
+              f"| items {done}/{total} (seen so far) | Success: {success} | Failed: {failed} "
+              f"| {done / elapsed:.1f} items/s | workers {len(self.processes)} | restarts {self.restarts}")
+
+    def run(self):
+        print(f"[Orchestrator] {len(self.chunk_paths)} chunks, {self.num_workers} workers, job={self.job}")
+        print(f"[Orchestrator] Worker logs: {LOG_FOLDER}/")
+
+        for path in self.chunk_paths:
+            self.task_queue.put((path, 1))
+        for _ in range(self.num_workers):
+            self._start_worker()
+
+        start_time = time.time()
+        last_report = 0.0
+        try:
+            while self._outstanding() > 0:
+                self._drain_events(timeout=1.0)
+                self._check_workers()
+                if time.time() - last_report >= REPORT_EVERY_SECONDS:
+                    self._report(start_time)
+                    last_report = time.time()
+        except (KeyboardInterrupt, RuntimeError) as e:
+            print(f"\n[Orchestrator] Stopping workers... {e}")
+            for p in self.processes.values():
+                p.terminate()
+        finally:
+            # Let idle workers exit cleanly
+            for _ in self.processes:
+                self.task_queue.put(None)
+            for p in self.processes.values():
+                p.join(timeout=30)
+
+        self._report(start_time)
+        duration = int(time.time() - start_time)
+        print("\n--- Orchestrator Summary ---")
+        print(f"Chunks finished: {len(self.finished)}/{len(self.chunk_paths)}")
+        print(f"Chunks given up: {len(self.given_up)}")
+        for path, error in self.given_up.items():
+            print(f"  {path}: {error}")
+        print(f"Worker restarts: {self.restarts}")
+        print(f"Time Taken:      {duration // 60}m {duration % 60}s")
+        return self.finished, self.given_up
+
+
+# ==========================================
+# 3. CLI
+# ==========================================
+
+def _chunk_number(path):
+    digits = "".join(ch for ch in os.path.basename(path) if ch.isdigit())
+    return int(digits) if digits else 0
+
+def select_chunks(pattern, start=None, end=None):
+    """Chunk files matching `pattern`, optionally limited to part numbers start..end."""
+    paths = sorted(glob.glob(pattern), key=_chunk_number)
+    if start is not None:
+        paths = [p for p in paths if _chunk_number(p) >= start]
+    if end is not None:
+        paths = [p for p in paths if _chunk_number(p) <= end]
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description="Run chunk jobs on a local process pool (replaces the PowerShell launchers).")
+    parser.add_argument("job", choices=sorted(JOBS), help="; ".join(f"{k} = {v[1]}" for k, v in JOBS.items()))
+    parser.add_argument("--chunks", default=None, help="Glob of chunk files (default depends on job)")
+    parser.add_argument("--start", type=int, default=None, help="First chunk number to run")
+    parser.add_argument("--end", type=int, default=None, help="Last chunk number to run")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS_PER_CHUNK)
+    args = parser.parse_args()
+
+    pattern = args.chunks or JOBS[args.job][0]
+    chunk_paths = select_chunks(pattern, args.start, args.end)
+    if not chunk_paths:
+        print(f"No chunk files match {pattern}.")
+        return
+
+    Orchestrator(args.job, chunk_paths, workers=args.workers, max_attempts=args.max_attempts).run()
+
+if __name__ == "__main__":
+    main()
+
+# python orchestrator.py cik --start 2 --end 11 --workers 4
+# DROPBOX_REFRESH_TOKEN=... python orchestrator.py migrate --start 11 --end 20 --workers 8
@@ -2,136 +2,326 @@ import csv
 import sys
 import os
 import time
-import random
 import datetime
 from pprint import pprint
+from concurrent.futures import ThreadPoolExecutor
 from drive_ops import GoogleDriveManager
-from dropbox_ops import DropboxManager
+from dropbox_ops import DropboxManager, SESSION_CHUNK_SIZE
+from client_pool import ClientPool
+from adaptive_concurrency import AdaptiveConcurrency, retry_delay
+from migration_state import MigrationState, DONE
+from work_queue import WorkQueue, DEFAULT_QUEUE_PATH, default_worker_id
 
 # --- CONFIGURATION ---
 APP_KEY = "dtm7p8v46wtwjh7"
 APP_SECRET = "ocp7hvlybeyoyqg"
 DROPBOX_ROOT_PATH = "/Nizar/sec_forms"
+# Needed for headless runs (orchestrator.py); without it DropboxManager asks for an auth code
+DROPBOX_REFRESH_TOKEN = os.environ.get("DROPBOX_REFRESH_TOKEN")
+UPLOAD_BATCH_SIZE = 50   # Files committed together with DropboxManager.upload_many
+DOWNLOAD_WORKERS = 16    # Download threads (one Drive client each) = ceiling for the AIMD limit
+INITIAL_IN_FLIGHT = 8    # Starting AIMD limit; grows while downloads succeed, halves on 429s
 
 # --- GLOBAL CLIENTS ---
 DRIVE_CLIENT = None
 DBX_CLIENT = None
+CLIENTS = None       # ClientPool for the download threads
+CONCURRENCY = None   # AdaptiveConcurrency: downloads allowed in flight right now
+DOWNLOADER = None    # ThreadPoolExecutor shared by every batch, so each thread keeps its pooled Drive client
 
 def transfer_file_with_retry(file_id, target_path, max_retries=3):
-    """Sequential transfer logic using global clients."""
+    """
+    Sequential transfer logic using this thread's pooled clients (download and upload overlap through a pipe).
+    Rate limits from either service are reported to CONCURRENCY and wait exactly the Retry-After.
+    """
     for attempt in range(1, max_retries + 1):
+        file_stream = None
         try:
-            # 1. Get Stream from Google
-            file_stream = DRIVE_CLIENT.get_file_stream(file_id)
-            
-            if not file_stream:
-                print(f"    [Attempt {attempt}] Google Drive returned empty stream.")
-                time.sleep(2)
-                continue
+            with CONCURRENCY.slot():
+                # 1. Open a pipe from Google (download runs in the background; 429s are raised, not retried)
+                file_stream = CLIENTS.drive().open_file_pipe(file_id, num_retries=0)
 
-            # 2. Upload Stream to Dropbox
-            result = DBX_CLIENT.upload_stream(file_stream, target_path)
-            
-            if hasattr(file_stream, 'close'):
-                file_stream.close()
+                # 2. Upload from the pipe to Dropbox, one chunk at a time
+                result = CLIENTS.dropbox().upload_stream(file_stream, target_path, session_threshold=SESSION_CHUNK_SIZE)
 
             if result:
+                CONCURRENCY.on_success()
                 return True
             else:
                 print(f"    [Attempt {attempt}] Dropbox upload returned None.")
 
         except Exception as e:
+            CONCURRENCY.report(e)
             print(f"    [Attempt {attempt}] Error: {str(e)}")
-            sleep_time = (attempt * 2) + random.uniform(0.1, 1.0)
-            time.sleep(sleep_time)
+            time.sleep(retry_delay(attempt, e))
+        finally:
+            if file_stream:
+                file_stream.close()
             
     return False
 
-def main():
-    global DRIVE_CLIENT, DBX_CLIENT
+def fits_batch(row):
+    """
+    True if the row's size_bytes says the file fits in one upload chunk. Larger files and
+    rows without a size go through the pipe instead of being buffered whole for upload_many.
+    """
+    try:
+        return int(row['size_bytes']) <= SESSION_CHUNK_SIZE
+    except (KeyError, TypeError, ValueError):
+        return False
 
-    # 1. Verify Argument
-    if len(sys.argv) < 2:
-        print("Usage: python process_chunk_sequential.py <path_to_chunk_csv>")
-        return
+def transfer_batch(pending):
+    """
+    pending: list of (file_id, target_path, row).
+    Downloads every file that fits_batch (DOWNLOAD_WORKERS at a time), commits them with ONE upload_many call,
+    and sends the rest, plus anything that failed, through transfer_file_with_retry.
+    Returns a list of (row, success) in the same order.
+    """
+    def download(task):
+        file_id, _, row = task
+        try:
+            with CONCURRENCY.slot():
+                file_stream = CLIENTS.drive().get_file_stream(file_id)
+            if file_stream is not None:
+                CONCURRENCY.on_success()
+            return file_stream
+        except Exception as e:
+            # Rate-limited files fall back to transfer_file_with_retry, which waits the Retry-After
+            CONCURRENCY.report(e)
+            print(f"    Download failed for {row['file_name']}: {e}")
+            return None
 
-    chunk_file = sys.argv[1]
+    small = [task for task in pending if fits_batch(task[2])]
+    retry = [(file_id, target_path) for file_id, target_path, row in pending if not fits_batch(row)]
+    streams = list(DOWNLOADER.map(download, small))
 
-    # 2. Initialize Managers
-    try:
-        DRIVE_CLIENT = GoogleDriveManager()
-        DBX_CLIENT = DropboxManager(APP_KEY, APP_SECRET)
-    except Exception as e:
-        print(f"Initialization failed: {e}")
-        return
+    items = []
+    downloaded = []
+    for (file_id, target_path, row), file_stream in zip(small, streams):
+        if file_stream:
+            items.append((file_stream, target_path))
+            downloaded.append((file_id, target_path))
+        else:
+            retry.append((file_id, target_path))
+
+    outcome = {}
+    if items:
+        try:
+            # Pooled clone: Dropbox 429s reach CONCURRENCY instead of being retried inside the SDK
+            results = CLIENTS.dropbox().upload_many(items)
+        except Exception as e:
+            print(f"    Batch upload error: {e}")
+            results = [{"success": False, "error": str(e)} for _ in items]
+        for (file_id, target_path), result in zip(downloaded, results):
+            outcome[target_path] = result["success"]
+            if not result["success"]:
+                retry.append((file_id, target_path))
+        for file_stream, _ in items:
+            file_stream.close()
+
+    for file_id, target_path in retry:
+        outcome[target_path] = transfer_file_with_retry(file_id, target_path)
+
+    return [(row, outcome[target_path]) for _, target_path, row in pending]
+
+def init_clients():
+    """Creates the global Drive/Dropbox clients for this process."""
+    global DRIVE_CLIENT, DBX_CLIENT, CLIENTS, CONCURRENCY, DOWNLOADER
+    DRIVE_CLIENT = GoogleDriveManager()
+    DBX_CLIENT = DropboxManager(APP_KEY, APP_SECRET, DROPBOX_REFRESH_TOKEN)
+    CONCURRENCY = AdaptiveConcurrency(initial=INITIAL_IN_FLIGHT, max_limit=DOWNLOAD_WORKERS)
+    CLIENTS = ClientPool(DRIVE_CLIENT, DBX_CLIENT, on_rate_limit=CONCURRENCY.on_rate_limit)
+    # Created once: a new executor per batch would build (and drop) DOWNLOAD_WORKERS Drive clients every batch
+    DOWNLOADER = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS, thread_name_prefix="download")
 
+def run_chunk(chunk_file, progress=None):
+    """
+    Migrates every row of one upload_chunk_N.csv. Clients must already be initialized.
+    progress: optional callback(done, total, success, failed) called after every batch
+              (used by orchestrator.py to build one combined progress view).
+    Returns {"total": ..., "success": ..., "failed": ...}.
+    """
     # 3. Read the Chunk CSV
     try:
         with open(chunk_file, 'r', encoding='utf-8') as f:
             reader = csv.DictReader(f)
             all_rows = list(reader)
-            total_items = len(all_rows)
     except Exception as e:
         print(f"Error reading chunk file: {e}")
-        return
+        raise
+
+    return run_rows(all_rows, chunk_file, progress)
 
-    print(f"\n--- Starting Sequential Migration for {chunk_file} ({total_items} items) ---")
+def run_rows(all_rows, label, progress=None):
+    """Migrates a list of chunk rows (folder_name, file_name, fid, ...). See run_chunk."""
+    total_items = len(all_rows)
+    print(f"\n--- Starting Sequential Migration for {label} ({total_items} items) ---")
     
     success_count = 0
     fail_count = 0
     start_time = time.time()
     existing_folders_cache = set()
+    # Per-file state (pending / in_flight / done / failed) for migration_state.py resume
+    state = MigrationState()
 
-    # 4. Process Rows One by One
-    for i, row in enumerate(all_rows):
-        current_num = i + 1
-        
-        folder_name = row['folder_name']
-        file_name = row['file_name']
-        file_id = row['fid']
-        
-        target_folder_path = f"{DROPBOX_ROOT_PATH}/{folder_name}"
-        target_file_path = f"{target_folder_path}/{file_name}"
-        
-        print(f"[{current_num}/{total_items}] Processing: {folder_name}/{file_name}")
+    # 4. Queue Rows, Commit in Batches
+    pending = []
 
+    def flush_pending(done):
+        nonlocal success_count, fail_count
+        print(f"  -> Transferring batch of {len(pending)}...")
+        state.started(pending)
+        reason = "Max retries reached"
         try:
-            # --- Ensure folder exists ---
-            if folder_name not in existing_folders_cache:
-                # We check this every time because we don't have a pre-built 
-                # global cache like the main script, but we track it locally for this chunk.
-                DBX_CLIENT.create_folder(target_folder_path)
-                existing_folders_cache.add(folder_name)
-            
-            # --- Transfer ---
-            if transfer_file_with_retry(file_id, target_file_path):
-                print(f"  -> SUCCESS")
+            outcomes = transfer_batch(pending)
+        except Exception as e:
+            # Not a per-file failure: fail the whole batch rather than carry it into the next one
+            print(f"  -> BATCH ERROR: {e}")
+            reason = str(e)
+            outcomes = [(row, False) for _, _, row in pending]
+        succeeded = []
+        failed = []
+        for row, ok in outcomes:
+            if ok:
+                succeeded.append(row)
                 success_count += 1
             else:
                 print(f"  -> FAILED after retries")
+                failed.append(row)
+                fail_count += 1
+                pprint({
+                    "file": row['file_name'],
+                    "folder": row['folder_name'],
+                    "fid": row['fid'],
+                    "reason": reason
+                })
+        state.succeeded(succeeded)
+        state.failed(failed, reason)
+        pending.clear()
+        if progress:
+            progress(done, total_items, success_count, fail_count)
+
+    try:
+        for i, row in enumerate(all_rows):
+            current_num = i + 1
+        
+            folder_name = row['folder_name']
+            file_name = row['file_name']
+            file_id = row['fid']
+        
+            target_folder_path = f"{DROPBOX_ROOT_PATH}/{folder_name}"
+            target_file_path = f"{target_folder_path}/{file_name}"
+        
+            print(f"[{current_num}/{total_items}] Queued: {folder_name}/{file_name}")
+
+            try:
+                # --- Ensure folder exists ---
+                if folder_name not in existing_folders_cache:
+                    # We check this every time because we don't have a pre-built 
+                    # global cache like the main script, but we track it locally for this chunk.
+                    DBX_CLIENT.create_folder(target_folder_path)
+                    existing_folders_cache.add(folder_name)
+            
+                pending.append((file_id, target_file_path, row))
+
+            except Exception as e:
+                print(f"  -> UNEXPECTED ERROR")
+                state.failed([row], str(e))
                 fail_count += 1
                 pprint({
                     "file": file_name,
                     "folder": folder_name,
-                    "fid": file_id,
-                    "reason": "Max retries reached"
+                    "error": str(e)
                 })
 
-        except Exception as e:
-            print(f"  -> UNEXPECTED ERROR")
-            fail_count += 1
-            pprint({
-                "file": file_name,
-                "folder": folder_name,
-                "error": str(e)
-            })
+            # Outside the per-row try: a batch error must not be blamed on (and counted for) this row only
+            if len(pending) >= UPLOAD_BATCH_SIZE:
+                flush_pending(current_num)
+
+        # Last partial batch
+        if pending:
+            flush_pending(total_items)
+    finally:
+        # Also on errors/KeyboardInterrupt, so the catalog connection is not leaked per task
+        state.close()
 
     # 5. Summary
     duration = int(time.time() - start_time)
-    print(f"\n--- Chunk Summary: {chunk_file} ---")
+    print(f"\n--- Chunk Summary: {label} ---")
     print(f"Success: {success_count}")
     print(f"Failed:  {fail_count}")
     print(f"Total Time: {duration // 60}m {duration % 60}s")
+    return {"total": total_items, "success": success_count, "failed": fail_count}
+
+def skip_done(rows):
+    """Drops rows this node's catalog already records as 'done' (a retried task only redoes the rest)."""
+    with MigrationState() as state:
+        states = state.catalog.migration_states_for(row['fid'] for row in rows)
+    return [row for row in rows if states.get(row['fid']) != DONE]
+
+def run_queue(queue_path=DEFAULT_QUEUE_PATH, worker_id=None):
+    """
+    Worker loop over the shared work queue (see get_process_chunk.py / work_queue.py):
+    claim a small task, keep its lease alive while migrating it, complete it, repeat.
+    A task that raises or has failed rows is released for another attempt (up to the
+    queue's MAX_ATTEMPTS); retries skip rows already done. Returns when nothing is left to claim.
+    """
+    worker_id = worker_id or default_worker_id()
+    totals = {"tasks": 0, "total": 0, "success": 0, "failed": 0}
+
+    with WorkQueue(queue_path) as work_queue:
+        while True:
+            claimed = work_queue.claim(worker_id)
+            if claimed is None:
+                break
+            task_id, rows, attempt = claimed
+            stop_heartbeat = work_queue.keep_alive(task_id, worker_id)
+            try:
+                if attempt > 1:
+                    rows = skip_done(rows)
+                summary = run_rows(rows, f"task {task_id} (attempt {attempt})")
+            except Exception as e:
+                print(f"Task {task_id} failed: {e}")
+                work_queue.release(task_id, worker_id, str(e))
+                continue
+            finally:
+                stop_heartbeat.set()
+
+            if summary["failed"]:
+                # Not done yet: give it back so the failed rows get another attempt
+                error = f"{summary['failed']} of {summary['total']} rows failed"
+                print(f"Task {task_id}: {error}, releasing it")
+                work_queue.release(task_id, worker_id, error)
+            elif not work_queue.complete(task_id, worker_id, summary):
+                print(f"[WorkQueue] Task {task_id} finished after its lease expired")
+            totals["tasks"] += 1
+            for key in ("total", "success", "failed"):
+                totals[key] += summary[key]
+
+    print(f"\n--- Queue worker {worker_id} done: {totals} ---")
+    return totals
+
+def main():
+    # 1. Verify Argument
+    if len(sys.argv) < 2:
+        print("Usage: python process_chunk.py <path_to_chunk_csv>")
+        print("       python process_chunk.py --queue [path_to_work_queue.sqlite]")
+        return
+
+    chunk_file = sys.argv[1]
+
+    # 2. Initialize Managers
+    try:
+        init_clients()
+    except Exception as e:
+        print(f"Initialization failed: {e}")
+        return
+
+    # Errors propagate: the traceback and a non-zero exit status tell the launcher the chunk failed
+    if chunk_file == "--queue":
+        run_queue(sys.argv[2] if len(sys.argv) > 2 else DEFAULT_QUEUE_PATH)
+    else:
+        run_chunk(chunk_file)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,15 @@
 import json
 import requests
-import pandas as pd
 import time
 import argparse
 import os
 from requests.exceptions import Timeout, RequestException
+from sec_rate_limiter import SharedRateLimiter, retry_after_seconds
+from sec_submissions_cache import SubmissionsCache
+from result_journal import ResultJournal
+from f13_extract import count_13f
+from cik_parser import load_cik_chunk
+from catalog import Catalog
 
 # CONFIGURATION
 EMAILS = [
@@ -15,6 +20,11 @@ EMAILS = [
 ]
 REQUEST_TIMEOUT = 30 # Increased to 30 seconds
 
+# One token bucket shared by every window/process on this machine
+RATE_LIMITER = SharedRateLimiter()
+# Local copy of every submissions file, revalidated with ETag / Last-Modified
+SUBMISSIONS_CACHE = SubmissionsCache()
+
 def get_headers(email):
     return {
         'accept': '*/*',
@@ -24,6 +34,21 @@ def get_headers(email):
         'user-agent': f'Mario bot project {email}',
     }
 
+def summarize_submissions(item, form_result):
+    """Builds the success record (filer name + 13F row count) from a submissions JSON."""
+    filer_name = form_result.get("name")
+    
+    # Scans only the 'form' array; no DataFrame needed just to count
+    f13_count = count_13f(form_result)
+    
+    return {
+        "name": item.get('name'),
+        "cik": item.get('cik'),
+        "filer_name": filer_name,
+        "13f_rows": f13_count,
+        "status": "success"
+    }
+
 def process_cik_item(item, emails):
     original_name = item.get('name')
     cik_raw = item.get('cik')
@@ -34,32 +59,25 @@ def process_cik_item(item, emails):
 
     for attempt in range(3):
         email = emails[attempt % len(emails)]
-        headers = get_headers(email)
+        headers = SUBMISSIONS_CACHE.conditional_headers(cik_padded, get_headers(email))
         
         try:
-            # IMPORTANT: Sleep is crucial when running multiple windows
-            # 1.5s sleep per window ensures 11 windows don't exceed SEC rate limits
-            time.sleep(1.5) 
+            # Shared limiter keeps ALL running windows together under SEC's 10 req/s
+            RATE_LIMITER.acquire()
             
             response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
             
-            if response.status_code == 200:
-                form_result = response.json()
-                filer_name = form_result.get("name")
-                
-                f13_count = 0
-                if 'filings' in form_result and 'recent' in form_result['filings']:
-                    df_forms = pd.DataFrame(form_result['filings']['recent'])
-                    if not df_forms.empty and 'form' in df_forms.columns:
-                        f13_count = int(df_forms['form'].str.contains('13F', na=False).sum())
-                
-                return {
-                    "name": original_name,
-                    "cik": cik_raw,
-                    "filer_name": filer_name,
-                    "13f_rows": f13_count,
-                    "status": "success"
-                }, True # Success flag
+            if response.status_code in (200, 304):
+                # 304 = unchanged since last run, body comes from the local cache
+                form_result = SUBMISSIONS_CACHE.resolve(cik_padded, response.status_code, response.content, response.headers)
+                if form_result is not None:
+                    return summarize_submissions(item, form_result), True # Success flag
+                last_error = "Cached body missing for 304"
+
+            elif response.status_code == 429:
+                # Pause every worker, not just this one
+                last_error = "HTTP 429"
+                RATE_LIMITER.backoff(retry_after_seconds(response.headers))
 
             else:
                 last_error = f"HTTP {response.status_code}"
@@ -71,6 +89,10 @@ def process_cik_item(item, emails):
         except RequestException as e:
             last_error = str(e)
             print(f"[{cik_padded}] Attempt {attempt+1}: Connection error.")
+        except ValueError as e:
+            # Truncated/garbled 200 body: counts as a failed attempt and is not cached
+            last_error = f"Invalid JSON: {e}"
+            print(f"[{cik_padded}] Attempt {attempt+1}: Invalid JSON body.")
         
         time.sleep(2) # Wait a bit longer before retrying a failed request
 
@@ -81,62 +103,95 @@ def process_cik_item(item, emails):
         "error": last_error
     }, False # Failure flag
 
-def main():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("input_file")
-    args = parser.parse_args()
-
-    if not os.path.exists(args.input_file):
-        print(f"File {args.input_file} not found.")
-        return
-
+def save_results(success_list, failed_list, output_success, output_failed):
+    """Writes the final JSON outputs (same format as before the journal existed)."""
+    with open(output_success, 'w') as f:
+        json.dump(success_list, f, indent=4)
+
+    if failed_list:
+        with open(output_failed, 'w') as f:
+            json.dump(failed_list, f, indent=4)
+        print(f"Saved {len(failed_list)} failures to {output_failed}")
+
+def run_chunk(input_file, resume=False, progress=None):
+    """
+    Processes one cik_chunks/cik_data_part_N.json file.
+    progress: optional callback(done, total, success, failed) called after every CIK
+              (used by orchestrator.py to build one combined progress view).
+    Returns {"total": ..., "success": ..., "failed": ...}.
+    """
     # Generate output filenames
     # cik_chunks/cik_data_part_1.json -> cik_update_part_1.json
-    base_name = os.path.basename(args.input_file)
+    base_name = os.path.basename(input_file)
     part_number = base_name.replace("cik_data_part_", "").replace(".json", "")
     
     output_success = f"cik_chunks/cik_update_part_{part_number}.json"
     output_failed = f"cik_chunks/failed_part_{part_number}.json"
+    # Append-only progress log: one line per CIK, replayed by --resume
+    output_journal = f"cik_chunks/cik_update_part_{part_number}.jsonl"
 
-    with open(args.input_file, 'r') as f:
-        data = json.load(f)
+    # Classic JSON list or a Parquet manifest from cik_parser.py
+    data = load_cik_chunk(input_file)
 
-    success_list = []
-    failed_list = []
+    # Results are keyed by position in the chunk: a CIK listed twice keeps both rows
+    success_by_pos = {}
+    failed_by_pos = {}
+    if resume:
+        success_by_pos, failed_by_pos = ResultJournal.read(output_journal)
+        print(f"Resuming: {len(success_by_pos)} CIKs already done, {len(failed_by_pos)} previous failures will be retried.")
 
-    print(f"Processing {len(data)} records from {base_name}...")
-    
-    try:
-        for i, item in enumerate(data):
-            result, is_success = process_cik_item(item, EMAILS)
-            
-            if is_success:
-                success_list.append(result)
-            else:
-                failed_list.append(result)
+    pending = [(str(pos), item) for pos, item in enumerate(data) if str(pos) not in success_by_pos]
 
-            if i % 10 == 0:
-                print(f"Progress: {i}/{len(data)} | Success: {len(success_list)} | Failed: {len(failed_list)}")
-            
-            
-            # Save Successes
-            with open(output_success, 'w') as f:
-                json.dump(success_list, f, indent=4)
-                
+    print(f"Processing {len(pending)} of {len(data)} records from {base_name}...")
+    
+    with ResultJournal(output_journal, resume=resume) as journal:
+        try:
+            for i, (pos, item) in enumerate(pending):
+                result, is_success = process_cik_item(item, EMAILS)
+                journal.append(result, ok=is_success, key=pos)
                 
-            # Save Failures (if any)
-            if failed_list:
-                with open(output_failed, 'w') as f:
-                    json.dump(failed_list, f, indent=4)
-                print(f"Saved {len(failed_list)} failures to {output_failed}")
+                if is_success:
+                    success_by_pos[pos] = result
+                    failed_by_pos.pop(pos, None)
+                else:
+                    failed_by_pos[pos] = result
+
+                if i % 10 == 0:
+                    print(f"Progress: {i}/{len(pending)} | Success: {len(success_by_pos)} | Failed: {len(failed_by_pos)}")
+                if progress:
+                    progress(len(data) - len(pending) + i + 1, len(data), len(success_by_pos), len(failed_by_pos))
+
+        except KeyboardInterrupt:
+            print("\nProcess interrupted by user. Saving progress...")
+            print(f"Run again with --resume to continue from {output_journal}")
+
+    # Single write of the final outputs instead of one rewrite per CIK, in chunk order
+    success_list = [success_by_pos[pos] for pos in sorted(success_by_pos, key=int)]
+    failed_list = [failed_by_pos[pos] for pos in sorted(failed_by_pos, key=int)]
+    save_results(success_list, failed_list, output_success, output_failed)
 
-    except KeyboardInterrupt:
-        print("\nProcess interrupted by user. Saving progress...")
+    # Same results in the shared catalog (indexed by CIK across every chunk)
+    with Catalog() as catalog:
+        catalog.upsert_cik_results(failed_list + success_list, source=base_name)
 
+    print(f"Finished. Successfully processed {len(success_by_pos)} records.")
+    return {"total": len(data), "success": len(success_by_pos), "failed": len(failed_by_pos)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_file")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue from the journal of a previous run, skipping CIKs already done")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"File {args.input_file} not found.")
+        return
 
-    print(f"Finished. Successfully processed {len(success_list)} records.")
+    run_chunk(args.input_file, resume=args.resume)
 
 if __name__ == "__main__":
     main()
     
-# python process_cik_chunk.py cik_chunks/cik_data_part_1.json
\ No newline at end of file
+# python process_cik_chunk.py cik_chunks/cik_data_part_1.json
+# python process_cik_chunk.py cik_chunks/cik_data_part_1.json --resume
\ No newline at end of file
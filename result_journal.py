@@ -0,0 +1,105 @@
+import os
+import json
+import time
+
+# --- CONFIGURATION ---
+FSYNC_EVERY_RECORDS = 200
+FSYNC_EVERY_SECONDS = 5.0
+
+
+class ResultJournal:
+    """
+    Append-only JSONL journal of per-CIK results.
+
+    Each processed CIK costs one small append instead of rewriting the whole
+    output file, and the file is fsync'ed periodically so a crash loses at
+    most a few seconds of work. Each line looks like:
+        {"ok": true,  "key": "0", "record": {...success dict...}}
+        {"ok": false, "key": "1", "record": {...failure dict...}}
+    "key" identifies the input item (e.g. its position in the chunk), so
+    duplicate CIKs in one chunk each keep their own result.
+    """
+
+    def __init__(self, path, resume=False,
+                 fsync_every=FSYNC_EVERY_RECORDS, fsync_interval=FSYNC_EVERY_SECONDS):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        # 'a' keeps previous progress for --resume, 'w' starts over
+        self._file = open(path, 'a' if resume else 'w', encoding='utf-8')
+        if resume and self._ends_mid_line(path):
+            # Crash left a torn last line; start ours on a fresh line
+            self._file.write("\n")
+        self._pending = 0
+        self._last_sync = time.time()
+
+    @staticmethod
+    def _ends_mid_line(path):
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+
+    def append(self, record, ok=True, key=None):
+        entry = {"ok": ok, "record": record}
+        if key is not None:
+            entry["key"] = str(key)
+        self._file.write(json.dumps(entry) + "\n")
+        self._pending += 1
+
+        if self._pending >= self.fsync_every or time.time() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """Flush Python buffers and force the data onto disk."""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+        self._last_sync = time.time()
+
+    def close(self):
+        if not self._file.closed:
+            self.sync()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def read(path):
+        """
+        Replays a journal. Returns (success_by_key, failed_by_key), both dicts keyed
+        by the entry's "key" in first-seen order. A later success for the same key
+        clears an earlier failure. A torn last line (crash mid-write) and entries
+        written without a key (older journals) are ignored.
+        """
+        success_by_key = {}
+        failed_by_key = {}
+
+        if not os.path.exists(path):
+            return success_by_key, failed_by_key
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+
+                record_key = entry.get("key")
+                if record_key is None:
+                    continue
+                record = entry.get("record", {})
+                if entry.get("ok"):
+                    success_by_key[record_key] = record
+                    failed_by_key.pop(record_key, None)
+                elif record_key not in success_by_key:
+                    failed_by_key[record_key] = record
+
+        return success_by_key, failed_by_key
@@ -6,8 +6,27 @@ START_CHUNK = 11
 END_CHUNK = 20
 CHUNK_FOLDER = "pending_chunks"
 SCRIPT_TO_RUN = "process_chunk.py"  # Ensure this matches your filename
+USE_WORK_QUEUE = True   # Launch queue workers (get_process_chunk.py enqueued the work) instead of chunk ranges
+QUEUE_WORKERS = 10      # Windows to open on this machine; other machines can run their own
+
+def launch(command):
+    # 'powershell -NoExit' keeps the window open so you can see the summary at the end
+    ps_full_command = f'powershell -NoExit -Command "{command}"'
+    # CREATE_NEW_CONSOLE tells Windows to open a separate window for each process
+    subprocess.Popen(
+        ps_full_command,
+        creationflags=subprocess.CREATE_NEW_CONSOLE
+    )
 
 def main():
+    if USE_WORK_QUEUE:
+        print(f"--- Spawning {QUEUE_WORKERS} PowerShell windows pulling from the work queue ---")
+        for i in range(QUEUE_WORKERS):
+            print(f"Launching queue worker {i + 1}...")
+            launch(f'python {SCRIPT_TO_RUN} --queue')
+        print("\nAll windows have been launched.")
+        return
+
     print(f"--- Spawning PowerShell windows for chunks {START_CHUNK} to {END_CHUNK} ---")
 
     for i in range(START_CHUNK, END_CHUNK + 1):
@@ -19,18 +38,8 @@ def main():
             print(f"Warning: {chunk_path} not found. Skipping...")
             continue
 
-        # Build the command
-        # 'powershell -NoExit' keeps the window open so you can see the summary at the end
-        command = f'python {SCRIPT_TO_RUN} {chunk_path}'
-        ps_full_command = f'powershell -NoExit -Command "{command}"'
-
         print(f"Launching window for Chunk {i}...")
-
-        # CREATE_NEW_CONSOLE tells Windows to open a separate window for each process
-        subprocess.Popen(
-            ps_full_command,
-            creationflags=subprocess.CREATE_NEW_CONSOLE
-        )
+        launch(f'python {SCRIPT_TO_RUN} {chunk_path}')
 
     print("\nAll windows have been launched.")
 
@@ -5,9 +5,15 @@ import time
 import argparse
 import os
 import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from requests.exceptions import Timeout, RequestException
 # Import the DropboxManager from your dropbox_ops.py file
 from dropbox_ops import DropboxManager
+from sec_rate_limiter import SharedRateLimiter, retry_after_seconds
+from sec_submissions_cache import SubmissionsCache
+from forms_table_writer import PartitionedTableWriter
+from sec_history import SUBMISSIONS_PAGE_URL, select_history_pages, page_cache_key, build_13f_table
 
 # --- CONFIGURATION ---
 EMAILS = [
@@ -15,15 +21,44 @@ EMAILS = [
     "project.mario.1@example.com"
 ]
 REQUEST_TIMEOUT = 30
+HISTORY_WORKERS = 4  # Parallel page fetches per CIK in --full-history mode
+
+# One token bucket shared by every process fetching from data.sec.gov
+RATE_LIMITER = SharedRateLimiter()
+# Local copy of every submissions file, revalidated with ETag / Last-Modified
+SUBMISSIONS_CACHE = SubmissionsCache()
 
 # DROPBOX CONFIG
 # Replace these with your actual credentials or environment variables
 APP_KEY = "dtm7p8v46wtwjh7"
 APP_SECRET = "ocp7hvlybeyoyqg"
 REFRESH_TOKEN = None 
+FORMS_TABLE_ROOT = "/Nizar/forms_table"
+
+# Set by --output-format parquet: collects many CIKs per typed Parquet file
+TABLE_WRITER = None
+
+# Dropbox Manager (created on first use so other scripts can import this module)
+dbx_handler = None
+
+# path_lower -> content_hash of the tables already in FORMS_TABLE_ROOT (synced once per run)
+remote_hashes = None
+remote_hashes_lock = threading.Lock()
 
-# Initialize Dropbox Manager
-dbx_handler = DropboxManager(APP_KEY, APP_SECRET, REFRESH_TOKEN)
+def get_dbx_handler():
+    global dbx_handler
+    if dbx_handler is None:
+        dbx_handler = DropboxManager(APP_KEY, APP_SECRET, REFRESH_TOKEN)
+    return dbx_handler
+
+def get_remote_hashes():
+    """Syncs the FORMS_TABLE_ROOT inventory on first use so unchanged tables can be skipped without per-file calls."""
+    global remote_hashes
+    with remote_hashes_lock:
+        if remote_hashes is None:
+            inventory = get_dbx_handler().sync_inventory(FORMS_TABLE_ROOT)
+            remote_hashes = {path_lower: item["content_hash"] for path_lower, item in inventory.items()}
+    return remote_hashes
 
 def get_headers(email):
     return {
@@ -34,102 +69,182 @@ def get_headers(email):
         'user-agent': f'Mario bot project {email}',
     }
 
-def upload_dataframe_to_dropbox(df, cik_padded):
-    """Converts dataframe to CSV bytes and uploads to Dropbox."""
-    if df.empty:
-        return False
-    
-    dropbox_path = f"/Nizar/forms_table/{cik_padded}.csv"
+def dataframe_to_csv_bytes(df):
+    """Converts dataframe to CSV bytes in memory (the exact bytes we upload)."""
+    csv_buffer = io.StringIO()
+    df.to_csv(csv_buffer, index=False)
+    return csv_buffer.getvalue().encode('utf-8')
+
+def upload_csv_bytes_to_dropbox(csv_bytes, cik_padded):
+    """Uploads an already-serialized 13F table to /Nizar/forms_table/{cik}.csv."""
+    dropbox_path = f"{FORMS_TABLE_ROOT}/{cik_padded}.csv"
     
     try:
-        # Convert DF to CSV bytes in memory
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_bytes = csv_buffer.getvalue().encode('utf-8')
-        
-        # Upload using your DropboxManager
-        meta = dbx_handler.upload_stream(csv_bytes, dropbox_path)
+        # Upload using your DropboxManager (skipped when the stored table is byte-identical)
+        remote_hash = get_remote_hashes().get(dropbox_path.lower())
+        meta = get_dbx_handler().upload_stream(csv_bytes, dropbox_path, remote_hash=remote_hash)
         return True if meta else False
     except Exception as e:
         print(f"  [Dropbox Error] Failed to upload {cik_padded}: {e}")
         return False
 
-def process_cik_item(item, emails):
-    """
-    Processes a single row from the CSV. 
-    item: a dictionary representing a row (must contain 'cik')
-    """
-    # Use .get() safely in case 'name' column doesn't exist in CSV
-    original_name = item.get('name', 'Unknown')
-    cik_raw = item.get('cik')
+def upload_dataframe_to_dropbox(df, cik_padded):
+    """Converts dataframe to CSV bytes and uploads to Dropbox."""
+    if df.empty:
+        return False
     
-    if pd.isna(cik_raw):
-        return {"error": "CIK is NaN"}, False
+    return upload_csv_bytes_to_dropbox(dataframe_to_csv_bytes(df), cik_padded)
 
-    # Ensure CIK is a 10-digit padded string
-    cik_padded = str(int(cik_raw)).zfill(10)
-    url = f'https://data.sec.gov/submissions/CIK{cik_padded}.json'
+def handle_submissions(original_name, cik_padded, form_result, history_pages=(), date_from=None, date_to=None):
+    """Filters the 13F rows out of a submissions JSON and uploads them as a table."""
+    # 1. Extract 13F Dataframe
+    # Gather the 13F rows (13F-HR, 13F-NT, etc.) column by column first,
+    # so pandas only ever sees the handful of rows we keep.
+    # history_pages (--full-history) add the older filings.files pages.
+    df_13f = build_13f_table(form_result, history_pages, date_from, date_to)
     
+    # 2. Upload to Dropbox if 13F data exists
+    if not df_13f.empty and TABLE_WRITER is not None:
+        # --output-format parquet: buffered into shared files, uploaded at the end
+        TABLE_WRITER.add(cik_padded, df_13f)
+        status_msg = "success + parquet"
+    elif not df_13f.empty:
+        upload_success = upload_dataframe_to_dropbox(df_13f, cik_padded)
+        status_msg = "success + uploaded" if upload_success else "success + upload_failed"
+    else:
+        status_msg = "success + no_13f_found"
+
+    return {
+        "name": original_name,
+        "cik": cik_padded,
+        "13f_count": len(df_13f),
+        "status": status_msg
+    }
+
+def fetch_submissions_json(url, cache_key, emails):
+    """
+    GETs one data.sec.gov submissions file through the shared rate limiter and the local cache.
+    Returns (json, None) on success or (None, error_message) after 3 attempts.
+    """
     last_error = "Unknown Error"
 
     for attempt in range(3):
         email = emails[attempt % len(emails)]
-        headers = get_headers(email)
+        headers = SUBMISSIONS_CACHE.conditional_headers(cache_key, get_headers(email))
         
         try:
-            # Rate limiting sleep (SEC allows 10 requests/sec)
-            time.sleep(1.1) 
+            # Shared rate limit (SEC allows 10 requests/sec across all workers)
+            RATE_LIMITER.acquire()
             
             response = requests.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
             
-            if response.status_code == 200:
-                form_result = response.json()
-                
-                # 1. Extract 13F Dataframe
-                df_13f = pd.DataFrame()
-                if 'filings' in form_result and 'recent' in form_result['filings']:
-                    df_all = pd.DataFrame(form_result['filings']['recent'])
-                    if not df_all.empty and 'form' in df_all.columns:
-                        # Filter for all 13F variations (13F-HR, 13F-NT, etc.)
-                        df_13f = df_all[df_all['form'].str.contains('13F', na=False)].copy()
-                
-                # 2. Upload to Dropbox if 13F data exists
-                if not df_13f.empty:
-                    upload_success = upload_dataframe_to_dropbox(df_13f, cik_padded)
-                    status_msg = "success + uploaded" if upload_success else "success + upload_failed"
-                else:
-                    status_msg = "success + no_13f_found"
-
-                return {
-                    "name": original_name,
-                    "cik": cik_padded,
-                    "13f_count": len(df_13f),
-                    "status": status_msg
-                }, True
+            if response.status_code in (200, 304):
+                # 304 = unchanged since last run, body comes from the local cache
+                form_result = SUBMISSIONS_CACHE.resolve(cache_key, response.status_code, response.content, response.headers)
+                if form_result is not None:
+                    return form_result, None
+                last_error = "Cached body missing for 304"
 
             elif response.status_code == 429:
-                print(f"[{cik_padded}] Rate limited by SEC. Sleeping 10s...")
-                time.sleep(10)
+                print(f"[{cache_key}] Rate limited by SEC. Pausing all workers...")
+                last_error = "HTTP 429"
+                RATE_LIMITER.backoff(retry_after_seconds(response.headers))
             else:
                 last_error = f"HTTP {response.status_code}"
 
         except (Timeout, RequestException) as e:
             last_error = str(e)
+        except ValueError as e:
+            # Truncated/garbled 200 body: counts as a failed attempt and is not cached
+            last_error = f"Invalid JSON: {e}"
         
-        print(f"[{cik_padded}] Attempt {attempt+1} failed: {last_error}")
+        print(f"[{cache_key}] Attempt {attempt+1} failed: {last_error}")
         time.sleep(2)
 
-    return {"name": original_name, "cik": cik_raw, "error": last_error}, False
+    return None, last_error
+
+def fetch_history_pages(pages, emails):
+    """
+    Fetches the selected filings.files pages concurrently.
+    Threads only overlap network latency; the shared limiter still caps req/s.
+    Each page goes through fetch_submissions_json, so a page that fails to parse is
+    retried like any other failed attempt and then fails the whole CIK.
+    Returns (list_of_page_json, None) or (None, error) if any page failed.
+    """
+    if not pages:
+        return [], None
+
+    def fetch_page(page):
+        url = SUBMISSIONS_PAGE_URL.format(name=page['name'])
+        return fetch_submissions_json(url, page_cache_key(page['name']), emails)
+
+    with ThreadPoolExecutor(max_workers=min(HISTORY_WORKERS, len(pages))) as executor:
+        results = list(executor.map(fetch_page, pages))
+
+    for page, (page_json, error) in zip(pages, results):
+        if page_json is None:
+            # Don't upload a table with a silent gap in the middle
+            return None, f"History page {page['name']}: {error}"
+
+    return [page_json for page_json, _ in results], None
+
+def process_cik_item(item, emails, full_history=False, date_from=None, date_to=None):
+    """
+    Processes a single row from the CSV. 
+    item: a dictionary representing a row (must contain 'cik')
+    full_history: also follow filings.files pages overlapping [date_from, date_to]
+    """
+    # Use .get() safely in case 'name' column doesn't exist in CSV
+    original_name = item.get('name', 'Unknown')
+    cik_raw = item.get('cik')
+    
+    if pd.isna(cik_raw):
+        return {"error": "CIK is NaN"}, False
+
+    # Ensure CIK is a 10-digit padded string
+    cik_padded = str(int(cik_raw)).zfill(10)
+    url = f'https://data.sec.gov/submissions/CIK{cik_padded}.json'
+    
+    form_result, error = fetch_submissions_json(url, cik_padded, emails)
+    if form_result is None:
+        return {"name": original_name, "cik": cik_raw, "error": error}, False
+
+    history_pages = []
+    if full_history:
+        pages = select_history_pages(form_result, date_from, date_to)
+        history_pages, error = fetch_history_pages(pages, emails)
+        if history_pages is None:
+            return {"name": original_name, "cik": cik_raw, "error": error}, False
+    else:
+        # The date window belongs to --full-history; without it the table is filings.recent as before
+        date_from = date_to = None
+
+    return handle_submissions(original_name, cik_padded, form_result, history_pages, date_from, date_to), True
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("input_csv", help="Path to the input CSV file containing a 'cik' column")
+    parser.add_argument("--full-history", action="store_true",
+                        help="Also fetch older filings.files pages (not just filings.recent)")
+    parser.add_argument("--date-from", default=None, help="With --full-history: only 13F filings on/after this date (YYYY-MM-DD)")
+    parser.add_argument("--date-to", default=None, help="With --full-history: only 13F filings on/before this date (YYYY-MM-DD)")
+    parser.add_argument("--output-format", choices=["csv", "parquet"], default="csv",
+                        help="csv = one file per CIK (default), parquet = partitioned files + manifest")
+    parser.add_argument("--partition-by", choices=["bucket", "year"], default="bucket",
+                        help="Parquet partitioning: CIK hash bucket or filing year")
     args = parser.parse_args()
 
     if not os.path.exists(args.input_csv):
         print(f"File {args.input_csv} not found.")
         return
 
+    # Connect to Dropbox up front (may prompt for authorization)
+    get_dbx_handler()
+
+    global TABLE_WRITER
+    if args.output_format == "parquet":
+        TABLE_WRITER = PartitionedTableWriter(partition_by=args.partition_by)
+
     # 1. Load the CSV
     try:
         df_input = pd.read_csv(args.input_csv)
@@ -156,7 +271,7 @@ def main():
     try:
         for i, item in enumerate(data_to_process):
             # Process item (Fetch SEC -> Filter 13F -> Upload Dropbox)
-            result, is_success = process_cik_item(item, EMAILS)
+            result, is_success = process_cik_item(item, EMAILS, args.full_history, args.date_from, args.date_to)
             
             if is_success:
                 success_list.append(result)
@@ -174,6 +289,11 @@ def main():
     except KeyboardInterrupt:
         print("\n[!] Process interrupted by user. Progress saved.")
 
+    # Parquet mode: write the remaining partitions + manifest, then upload a handful of files
+    if TABLE_WRITER is not None:
+        TABLE_WRITER.close()
+        TABLE_WRITER.upload(get_dbx_handler())
+
     # Final save for failures
     if failed_list:
         with open(output_failed, 'w') as f:
@@ -185,4 +305,6 @@ def main():
 if __name__ == "__main__":
     main()
 
-# Usage: python run_updated_table.py cik_to_run.csv
\ No newline at end of file
+# Usage: python run_updated_table.py cik_to_run.csv
+#        python run_updated_table.py cik_to_run.csv --full-history --date-from 2013-01-01
+#        python run_updated_table.py cik_to_run.csv --output-format parquet --partition-by year
\ No newline at end of file
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import aiohttp
+import pandas as pd
+
+from sec_rate_limiter import SharedRateLimiter, retry_after_seconds
+from sec_submissions_cache import SubmissionsCache
+from process_cik_chunk import EMAILS, get_headers, summarize_submissions
+from cik_parser import load_cik_chunk
+
+# --- CONFIGURATION ---
+REQUEST_TIMEOUT = 30
+MAX_IN_FLIGHT = 20       # Concurrent requests; the rate limiter decides the actual req/s
+MAX_ATTEMPTS = 3
+SUBMISSIONS_URL = "https://data.sec.gov/submissions/CIK{cik}.json"
+
+
+# ==========================================
+# 1. INPUT LOADING
+# ==========================================
+
+def load_cik_items(input_path):
+    """
+    Loads the CIK list from either:
+    - a cik_parser.py chunk (cik_chunks/cik_data_part_N.json), or
+    - a CSV with a 'cik' column (e.g. cik_to_run.csv).
+    Returns a list of dicts with at least 'cik' (and 'name' when available).
+    """
+    if input_path.lower().endswith(".csv"):
+        df_input = pd.read_csv(input_path, dtype={"cik": str})
+        if 'cik' not in df_input.columns:
+            raise ValueError("The CSV file must have a column named 'cik'.")
+        df_input = df_input.dropna(subset=['cik'])
+        return df_input.to_dict('records')
+
+    # Classic JSON list or a Parquet manifest from cik_parser.py
+    return load_cik_chunk(input_path)
+
+
+# ==========================================
+# 2. FETCH ENGINE
+# ==========================================
+
+class AsyncSubmissionsFetcher:
+    """
+    Fetches data.sec.gov submissions for a whole CIK list from ONE process.
+
+    - One aiohttp session with keep-alive connections (no new TLS handshake per CIK).
+    - At most `max_in_flight` requests outstanding at any time.
+    - Every request draws from the shared SharedRateLimiter, so the engine runs
+      right at SEC's ceiling and still plays nicely with any other workers.
+    """
+
+    def __init__(self, handler, max_in_flight=MAX_IN_FLIGHT, limiter=None, emails=EMAILS, cache=None):
+        """
+        handler: function(item, form_result) -> result dict. Runs in a thread so
+                 blocking work (pandas, Dropbox uploads) never stalls the event loop.
+        """
+        self.handler = handler
+        self.max_in_flight = max_in_flight
+        self.limiter = limiter or SharedRateLimiter()
+        self.cache = cache or SubmissionsCache()
+        self.emails = emails
+
+        self.success_list = []
+        self.failed_list = []
+        self.done = 0
+
+    async def _fetch_json(self, session, cik_padded):
+        """GETs one submissions file with retries. Returns (json, error)."""
+        url = SUBMISSIONS_URL.format(cik=cik_padded)
+        last_error = "Unknown Error"
+
+        for attempt in range(MAX_ATTEMPTS):
+            headers = self.cache.conditional_headers(cik_padded, get_headers(self.emails[attempt % len(self.emails)]))
+            await self.limiter.acquire_async()
+
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status in (200, 304):
+                        body = await response.read()
+                        form_result = self.cache.resolve(cik_padded, response.status, body, response.headers)
+                        if form_result is not None:
+                            return form_result, None
+                        last_error = "Cached body missing for 304"
+                        continue
+
+                    if response.status == 429:
+                        last_error = "HTTP 429"
+                        self.limiter.backoff(retry_after_seconds(response.headers))
+                        continue
+
+                    last_error = f"HTTP {response.status}"
+                    if response.status == 404:
+                        # No submissions file for this CIK; retrying won't help
+                        break
+
+            except asyncio.TimeoutError:
+                last_error = "Timeout"
+            except aiohttp.ClientError as e:
+                last_error = str(e)
+            except ValueError as e:
+                # Truncated/garbled 200 body: counts as a failed attempt and is not cached
+                last_error = f"Invalid JSON: {e}"
+
+            print(f"[{cik_padded}] Attempt {attempt+1} failed: {last_error}")
+            await asyncio.sleep(2)
+
+        return None, last_error
+
+    async def _process_item(self, session, item):
+        cik_raw = item.get('cik')
+        try:
+            cik_padded = str(int(cik_raw)).zfill(10)
+        except (TypeError, ValueError):
+            self.failed_list.append({"name": item.get('name'), "cik": cik_raw, "error": "Invalid CIK"})
+            return
+
+        form_result, error = await self._fetch_json(session, cik_padded)
+        if form_result is None:
+            self.failed_list.append({"name": item.get('name'), "cik": cik_raw, "error": error})
+            return
+
+        try:
+            result = await asyncio.to_thread(self.handler, item, form_result)
+            self.success_list.append(result)
+        except Exception as e:
+            self.failed_list.append({"name": item.get('name'), "cik": cik_raw, "error": str(e)})
+
+    async def _worker(self, session, queue, total, start_time):
+        while True:
+            item = await queue.get()
+            try:
+                await self._process_item(session, item)
+            finally:
+                self.done += 1
+                queue.task_done()
+
+            if self.done % 100 == 0:
+                rate = self.done / max(time.time() - start_time, 1e-6)
+                print(f"Progress: {self.done}/{total} | Success: {len(self.success_list)} "
+                      f"| Failed: {len(self.failed_list)} | Cache hits: {self.cache.hits} | {rate:.1f} CIK/s")
+
+    async def run(self, items):
+        """Processes every item. Returns (success_list, failed_list)."""
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        # Connection pool sized to the in-flight bound; connections are kept alive between requests
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight, keepalive_timeout=60)
+
+        start_time = time.time()
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            workers = [
+                asyncio.create_task(self._worker(session, queue, len(items), start_time))
+                for _ in range(self.max_in_flight)
+            ]
+            try:
+                await queue.join()
+            finally:
+                for w in workers:
+                    w.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+
+        return self.success_list, self.failed_list
+
+
+# ==========================================
+# 3. CLI
+# ==========================================
+
+def get_handler(mode):
+    """count -> process_cik_chunk.py records, table -> run_updated_table.py records + uploads."""
+    if mode == "count":
+        return summarize_submissions
+
+    import run_updated_table
+    run_updated_table.get_dbx_handler()
+
+    def table_handler(item, form_result):
+        cik_padded = str(int(item.get('cik'))).zfill(10)
+        return run_updated_table.handle_submissions(item.get('name', 'Unknown'), cik_padded, form_result)
+
+    return table_handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch SEC submissions for a whole CIK list from one process.")
+    parser.add_argument("input_file", help="cik_chunks/cik_data_part_N.json or a CSV with a 'cik' column")
+    parser.add_argument("--mode", choices=["count", "table"], default=None,
+                        help="count = 13F row counts (default for JSON), table = upload 13F tables (default for CSV)")
+    parser.add_argument("--max-in-flight", type=int, default=MAX_IN_FLIGHT)
+    parser.add_argument("--rate", type=float, default=None, help="Override requests/second (default: SEC limit)")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input_file):
+        print(f"File {args.input_file} not found.")
+        return
+
+    mode = args.mode or ("table" if args.input_file.lower().endswith(".csv") else "count")
+    items = load_cik_items(args.input_file)
+
+    # Same output naming as the single-threaded scripts
+    base_name = os.path.splitext(os.path.basename(args.input_file))[0]
+    if mode == "count":
+        part_number = base_name.replace("cik_data_part_", "")
+        output_success = f"cik_chunks/cik_update_part_{part_number}.json"
+        output_failed = f"cik_chunks/failed_part_{part_number}.json"
+    else:
+        output_success = f"{base_name}_results.json"
+        output_failed = f"{base_name}_failed.json"
+
+    limiter = SharedRateLimiter(rate=args.rate) if args.rate else SharedRateLimiter()
+    fetcher = AsyncSubmissionsFetcher(get_handler(mode), max_in_flight=args.max_in_flight, limiter=limiter)
+
+    print(f"Processing {len(items)} CIKs from {args.input_file} (mode={mode}, in-flight={args.max_in_flight})...")
+    start_time = time.time()
+
+    try:
+        asyncio.run(fetcher.run(items))
+    except KeyboardInterrupt:
+        print("\nProcess interrupted by user. Saving progress...")
+
+    with open(output_success, 'w') as f:
+        json.dump(fetcher.success_list, f, indent=4)
+    if fetcher.failed_list:
+        with open(output_failed, 'w') as f:
+            json.dump(fetcher.failed_list, f, indent=4)
+        print(f"Saved {len(fetcher.failed_list)} failures to {output_failed}")
+
+    duration = int(time.time() - start_time)
+    print(f"Finished. Successfully processed {len(fetcher.success_list)} records in {duration // 60}m {duration % 60}s.")
+
+if __name__ == "__main__":
+    main()
+
+# python sec_async_fetcher.py cik_chunks/cik_data_part_1.json
+# python sec_async_fetcher.py cik_to_run.csv --mode table
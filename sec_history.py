@@ -0,0 +1,65 @@
+import pandas as pd
+
+from f13_extract import get_recent, extract_13f_columns
+
+SUBMISSIONS_PAGE_URL = "https://data.sec.gov/submissions/{name}"
+
+
+def _overlaps(page, date_from=None, date_to=None):
+    """True if the page's [filingFrom, filingTo] range touches the requested window (ISO dates)."""
+    page_from = page.get('filingFrom') or ""
+    page_to = page.get('filingTo') or "9999-12-31"
+    if date_from and page_to < date_from:
+        return False
+    if date_to and page_from > date_to:
+        return False
+    return True
+
+
+def select_history_pages(form_result, date_from=None, date_to=None):
+    """
+    Older filings live in extra files listed under filings.files:
+        {"name": "CIK0001234567-submissions-001.json", "filingCount": 2000,
+         "filingFrom": "2002-01-14", "filingTo": "2012-03-30"}
+    Returns only the pages whose date range overlaps [date_from, date_to].
+    """
+    filings = form_result.get('filings') or {}
+    return [page for page in filings.get('files') or [] if _overlaps(page, date_from, date_to)]
+
+
+def page_cache_key(page_name):
+    """'CIK0001234567-submissions-001.json' -> '0001234567-submissions-001' (SubmissionsCache key)."""
+    key = page_name
+    if key.startswith("CIK"):
+        key = key[3:]
+    if key.endswith(".json"):
+        key = key[:-5]
+    return key
+
+
+def build_13f_table(form_result, history_pages=(), date_from=None, date_to=None):
+    """
+    Combines the 13F rows of filings.recent with those of any fetched history pages.
+    History pages hold the same parallel arrays as filings.recent, just at the top level.
+    When a date window is given, rows are kept only if filingDate falls inside it.
+    """
+    frames = []
+    for block in [get_recent(form_result)] + list(history_pages):
+        columns = extract_13f_columns(block)
+        if columns:
+            frames.append(pd.DataFrame(columns))
+
+    if not frames:
+        return pd.DataFrame()
+
+    df_13f = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    if (date_from or date_to) and 'filingDate' in df_13f.columns:
+        mask = pd.Series(True, index=df_13f.index)
+        if date_from:
+            mask &= df_13f['filingDate'] >= date_from
+        if date_to:
+            mask &= df_13f['filingDate'] <= date_to
+        df_13f = df_13f[mask].reset_index(drop=True)
+
+    return df_13f
@@ -0,0 +1,172 @@
+import os
+import time
+import struct
+import asyncio
+import tempfile
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+# --- CONFIGURATION ---
+# SEC fair-access policy: at most 10 requests per second per host/user-agent.
+SEC_MAX_REQUESTS_PER_SECOND = 10
+# Shared by every worker process on this machine (override with env var)
+DEFAULT_STATE_FILE = os.environ.get(
+    "SEC_RATE_LIMIT_FILE",
+    os.path.join(tempfile.gettempdir(), "sec_rate_limiter.bin")
+)
+# How long everyone pauses after a 429 when SEC sends no Retry-After
+DEFAULT_BACKOFF_SECONDS = 10
+
+# Bucket state on disk: tokens, last refill timestamp, paused-until timestamp
+_STATE = struct.Struct("<ddd")
+
+
+class SharedRateLimiter:
+    """
+    Token bucket shared by all processes through a small locked state file.
+
+    Every worker (PowerShell window, pool process, async task) draws tokens
+    from the same file, so the aggregate request rate stays at `rate`
+    no matter how many workers are running. When any worker reports a 429,
+    the whole bucket is paused and every worker backs off together.
+    """
+
+    def __init__(self, rate=SEC_MAX_REQUESTS_PER_SECOND, capacity=1, state_file=DEFAULT_STATE_FILE):
+        """
+        rate:     tokens (requests) added per second across all processes.
+        capacity: burst size. Keep it small so requests stay evenly spaced.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.state_file = state_file
+
+    # ==========================================
+    # 1. SHARED STATE (LOCKED FILE)
+    # ==========================================
+
+    @contextmanager
+    def _locked_state(self):
+        """Opens the state file under an exclusive OS lock."""
+        fd = os.open(self.state_file, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.name == "nt":
+                # msvcrt.LK_LOCK gives up after ~10s, so keep trying
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            raw = os.read(fd, _STATE.size)
+            if len(raw) == _STATE.size:
+                state = list(_STATE.unpack(raw))
+            else:
+                # First use: start with a full bucket
+                state = [self.capacity, time.time(), 0.0]
+
+            yield state
+
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.write(fd, _STATE.pack(*state))
+        finally:
+            if os.name == "nt":
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _reserve(self):
+        """
+        Takes one token. Returns (granted, wait_seconds).
+        - granted=True:  token reserved, caller must wait `wait_seconds` before sending.
+        - granted=False: bucket is paused after a 429, caller should retry after `wait_seconds`.
+        """
+        with self._locked_state() as state:
+            tokens, last, paused_until = state
+            now = time.time()
+
+            if now < paused_until:
+                return False, paused_until - now
+
+            # Refill (never before the pause ended)
+            elapsed = max(0.0, now - last)
+            tokens = min(self.capacity, tokens + elapsed * self.rate)
+            tokens -= 1.0
+
+            state[0] = tokens
+            state[1] = max(now, last)
+
+            # Negative balance = requests already promised to other workers
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+            return True, wait
+
+    def _paused_for(self):
+        with self._locked_state() as state:
+            return max(0.0, state[2] - time.time())
+
+    # ==========================================
+    # 2. PUBLIC API
+    # ==========================================
+
+    def acquire(self):
+        """Blocks until this process may send one request."""
+        while True:
+            granted, wait = self._reserve()
+            if wait > 0:
+                time.sleep(wait)
+            if granted:
+                # Someone may have hit a 429 while we were waiting for our slot
+                if wait > 0:
+                    paused = self._paused_for()
+                    if paused > 0:
+                        time.sleep(paused)
+                return
+
+    async def acquire_async(self):
+        """Asyncio version of acquire(). The file lock is held for microseconds only."""
+        while True:
+            granted, wait = self._reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if granted:
+                if wait > 0:
+                    paused = self._paused_for()
+                    if paused > 0:
+                        await asyncio.sleep(paused)
+                return
+
+    def backoff(self, seconds=None):
+        """
+        Pauses the bucket for ALL workers (call this on HTTP 429).
+        `seconds` should come from the Retry-After header when SEC sends one.
+        """
+        if seconds is None or seconds <= 0:
+            seconds = DEFAULT_BACKOFF_SECONDS
+
+        with self._locked_state() as state:
+            until = time.time() + seconds
+            if until > state[2]:
+                state[2] = until
+            # Drop any saved-up burst and restart the refill clock at the end of the pause
+            state[0] = min(state[0], 0.0)
+            state[1] = max(state[1], state[2])
+
+        print(f"[RateLimiter] 429 received. All workers pausing for {seconds:.1f}s")
+
+
+def retry_after_seconds(headers, default=DEFAULT_BACKOFF_SECONDS):
+    """Reads a numeric Retry-After header (SEC sends seconds), falling back to `default`."""
+    value = headers.get("Retry-After") if headers else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
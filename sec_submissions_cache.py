@@ -0,0 +1,130 @@
+import os
+import gzip
+import json
+
+from f13_extract import loads
+
+# --- CONFIGURATION ---
+DEFAULT_CACHE_DIR = os.environ.get("SEC_CACHE_DIR", "sec_cache")
+COMPRESS_LEVEL = 6
+
+
+class SubmissionsCache:
+    """
+    On-disk cache for data.sec.gov submissions files.
+
+    One entry per key (the padded CIK, e.g. '0001463262'):
+      - CIK##########.json.gz    : gzip-compressed response body
+      - CIK##########.meta.json  : ETag / Last-Modified validators
+
+    Re-runs send a conditional request; a 304 reuses the cached body, so a full
+    refresh mostly costs cheap revalidations instead of full downloads.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+
+    def _body_path(self, key):
+        return os.path.join(self.cache_dir, f"CIK{key}.json.gz")
+
+    def _meta_path(self, key):
+        return os.path.join(self.cache_dir, f"CIK{key}.meta.json")
+
+    @staticmethod
+    def _atomic_write(path, data):
+        """Write to a temp file then rename, so parallel workers never see half a file."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    # ==========================================
+    # 1. READ
+    # ==========================================
+
+    def get_validators(self, key):
+        """Returns {'etag': ..., 'last_modified': ...} or {} if nothing usable is cached."""
+        if not os.path.exists(self._body_path(key)):
+            return {}
+        try:
+            with open(self._meta_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def conditional_headers(self, key, headers):
+        """Returns a copy of `headers` with If-None-Match / If-Modified-Since added when cached."""
+        headers = dict(headers)
+        validators = self.get_validators(key)
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def load_body(self, key):
+        """Returns the cached (decompressed) body bytes, or None."""
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                return gzip.decompress(f.read())
+        except (OSError, EOFError):
+            return None
+
+    # ==========================================
+    # 2. WRITE
+    # ==========================================
+
+    def store(self, key, body, response_headers):
+        """Saves a 200 response body plus its validators."""
+        self._atomic_write(self._body_path(key), gzip.compress(body, compresslevel=COMPRESS_LEVEL))
+
+        meta = {
+            "etag": response_headers.get('ETag'),
+            "last_modified": response_headers.get('Last-Modified'),
+        }
+        # Body first, then validators: a crash in between only costs one full re-download
+        self._atomic_write(self._meta_path(key), json.dumps(meta).encode('utf-8'))
+
+    def invalidate(self, key):
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    # ==========================================
+    # 3. RESPONSE HANDLING
+    # ==========================================
+
+    def resolve(self, key, status_code, body, response_headers):
+        """
+        Turns a 200/304 response into the submissions JSON.
+        - 200: stores the new body and returns it parsed.
+        - 304: returns the cached body parsed.
+        Returns None if the cached body is missing/corrupt (entry is dropped so the
+        next attempt does a full download).
+        Raises ValueError (JSONDecodeError / orjson.JSONDecodeError) if a 200 body
+        does not parse; nothing is cached then, callers count it as a failed attempt.
+        """
+        if status_code == 200:
+            self.misses += 1
+            result = loads(body)
+            # Only cache bodies that parsed
+            self.store(key, body, response_headers)
+            return result
+
+        if status_code == 304:
+            cached = self.load_body(key)
+            if cached is not None:
+                try:
+                    result = loads(cached)
+                    self.hits += 1
+                    return result
+                except ValueError:
+                    pass
+            self.invalidate(key)
+
+        return None
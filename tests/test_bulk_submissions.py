@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import zipfile
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bulk_submissions  # noqa: E402
+from forms_table_writer import PartitionedTableWriter, read_cik_table  # noqa: E402
+
+CIK_OK = "0000000001"
+CIK_MALFORMED = "0000000002"
+CIK_MISSING = "0000000003"
+HISTORY_PAGE = f"CIK{CIK_OK}-submissions-001.json"
+
+
+def _recent(forms, dates):
+    return {
+        "accessionNumber": [f"0000000001-{i:02d}" for i in range(len(forms))],
+        "filingDate": dates,
+        "form": forms,
+    }
+
+
+@pytest.fixture
+def submissions_zip(tmp_path):
+    """Tiny submissions.zip: one filer with a history page, plus one malformed member."""
+    main = {
+        "cik": CIK_OK,
+        "name": "TEST FILER",
+        "filings": {
+            "recent": _recent(["13F-HR", "10-K", "13F-HR/A"], ["2024-05-15", "2024-03-01", "2024-02-14"]),
+            "files": [{"name": HISTORY_PAGE, "filingCount": 2,
+                       "filingFrom": "2010-01-01", "filingTo": "2012-12-31"}],
+        },
+    }
+    page = _recent(["13F-HR", "8-K"], ["2012-11-14", "2011-06-01"])
+
+    path = tmp_path / "submissions.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr(f"CIK{CIK_OK}.json", json.dumps(main))
+        zf.writestr(HISTORY_PAGE, json.dumps(page))
+        zf.writestr(f"CIK{CIK_MALFORMED}.json", "{not json")
+    return str(path)
+
+
+ITEMS = [
+    {"name": "malformed", "cik": CIK_MALFORMED},
+    {"name": "ok", "cik": CIK_OK},
+    {"name": "missing", "cik": CIK_MISSING},
+]
+
+
+def test_count_mode(submissions_zip):
+    success, failed = bulk_submissions.run_bulk(submissions_zip, ITEMS, "count", max_workers=1)
+
+    assert [r["cik"] for r in success] == [CIK_OK]
+    assert success[0]["13f_rows"] == 2
+    # Failures keep the input order, whether they failed in the pool or before it
+    assert [r["cik"] for r in failed] == [CIK_MALFORMED, CIK_MISSING]
+    assert failed[1]["error"] == "Not in submissions.zip"
+
+
+def test_table_mode_csv_with_history(submissions_zip, tmp_path):
+    local_folder = str(tmp_path / "forms_table")
+    success, failed = bulk_submissions.run_bulk(
+        submissions_zip, ITEMS, "table", full_history=True, local_folder=local_folder, max_workers=1
+    )
+
+    assert [r["13f_count"] for r in success] == [3]
+    assert success[0]["status"] == "success + saved"
+    assert len(failed) == 2
+
+    table = pd.read_csv(os.path.join(local_folder, f"{CIK_OK}.csv"), dtype=str)
+    assert sorted(table["filingDate"]) == ["2012-11-14", "2024-02-14", "2024-05-15"]
+
+
+def test_table_mode_parquet(submissions_zip, tmp_path):
+    output_folder = str(tmp_path / "forms_table_parquet")
+    writer = PartitionedTableWriter(output_folder=output_folder)
+    success, _ = bulk_submissions.run_bulk(submissions_zip, ITEMS, "table", max_workers=1, table_writer=writer)
+    writer.close()
+
+    assert success[0]["status"] == "success + parquet"
+    # Without --full-history only filings.recent is used
+    assert len(read_cik_table(CIK_OK, output_folder)) == 2
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+
+# --- CONFIGURATION ---
+# Put this on a share every node can reach to spread the work across machines
+DEFAULT_QUEUE_PATH = os.environ.get("WORK_QUEUE_PATH", "work_queue.sqlite")
+DEFAULT_QUEUE_NAME = "migrate"
+LEASE_SECONDS = 300           # A claimed task returns to the queue if not heartbeated for this long
+HEARTBEAT_SECONDS = 60
+MAX_ATTEMPTS = 5              # Leases per task before it is marked failed
+BUSY_TIMEOUT_SECONDS = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id            INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue         TEXT NOT NULL,
+    payload       TEXT NOT NULL,
+    size          INTEGER NOT NULL,
+    state         TEXT NOT NULL,
+    owner         TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT,
+    summary       TEXT,
+    updated_at    REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_claim ON tasks (queue, state, lease_expires);
+"""
+
+
+def default_worker_id():
+    """'hostname:pid', unique across the nodes sharing a queue."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Lease-based task queue in one SQLite file.
+
+    Each task is a small batch of rows (JSON). A worker claim()s a task and owns it
+    until lease_expires; it must heartbeat() to keep it and then complete() or release() it.
+    A task whose lease ran out (crashed or hung worker) is handed to the next claim(),
+    up to MAX_ATTEMPTS leases, after which it is marked failed.
+
+    Claims run in BEGIN IMMEDIATE transactions, so two workers never get the same task.
+    Leases use wall-clock time: nodes sharing a queue need roughly synchronized clocks.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, queue=DEFAULT_QUEUE_NAME,
+                 lease_seconds=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.queue = queue
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # isolation_level=None: transactions are explicit (BEGIN IMMEDIATE for claims)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        # Default rollback journal on purpose: WAL needs shared memory, which a network share cannot provide
+        self.conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _transaction(self, work):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(self.conn)
+                self.conn.execute("COMMIT")
+                return result
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    # ==========================================
+    # 1. PRODUCER
+    # ==========================================
+
+    def enqueue(self, rows, batch_size, replace=False):
+        """
+        Splits `rows` (JSON-serializable dicts) into tasks of `batch_size`. Returns the number of tasks.
+        replace: first drop this queue's tasks that nobody holds: queued, failed and expired leases
+                 (a fresh listing supersedes them). Live leases are left to their workers.
+        """
+        rows = list(rows)
+        now = time.time()
+        tasks = [
+            (self.queue, json.dumps(rows[i : i + batch_size]), len(rows[i : i + batch_size]), "queued", now)
+            for i in range(0, len(rows), batch_size)
+        ]
+
+        def work(conn):
+            if replace:
+                conn.execute("""
+                    DELETE FROM tasks
+                    WHERE queue = ? AND (state IN ('queued', 'failed') OR (state = 'leased' AND lease_expires < ?))
+                """, (self.queue, now))
+            conn.executemany("INSERT INTO tasks (queue, payload, size, state, updated_at) VALUES (?, ?, ?, ?, ?)", tasks)
+            return len(tasks)
+
+        return self._transaction(work)
+
+    # ==========================================
+    # 2. WORKER
+    # ==========================================
+
+    def claim(self, worker_id):
+        """Leases the next task. Returns (task_id, rows, attempt) or None when nothing is claimable."""
+        def work(conn):
+            now = time.time()
+            # Expired leases that used up their attempts are given up instead of handed out again
+            conn.execute("""
+                UPDATE tasks SET state = 'failed', owner = NULL, updated_at = ?,
+                                 last_error = COALESCE(last_error, 'lease expired')
+                WHERE queue = ? AND state = 'leased' AND lease_expires < ? AND attempts >= ?
+            """, (now, self.queue, now, self.max_attempts))
+            row = conn.execute("""
+                SELECT id, payload, attempts FROM tasks
+                WHERE queue = ? AND (state = 'queued' OR (state = 'leased' AND lease_expires < ?))
+                ORDER BY id LIMIT 1
+            """, (self.queue, now)).fetchone()
+            if row is None:
+                return None
+            conn.execute("""
+                UPDATE tasks SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+                WHERE id = ?
+            """, (worker_id, now + self.lease_seconds, now, row["id"]))
+            return row["id"], json.loads(row["payload"]), row["attempts"] + 1
+
+        return self._transaction(work)
+
+    def _update_owned(self, sql, params, task_id, worker_id):
+        """Runs an UPDATE only if `worker_id` still holds the lease. Returns True if it did."""
+        with self._lock:
+            cursor = self.conn.execute(sql + " WHERE id = ? AND owner = ? AND state = 'leased'",
+                                       params + (task_id, worker_id))
+            return cursor.rowcount == 1
+
+    def heartbeat(self, task_id, worker_id):
+        """Extends the lease. False means the lease expired and another worker may have taken the task."""
+        now = time.time()
+        return self._update_owned("UPDATE tasks SET lease_expires = ?, updated_at = ?",
+                                  (now + self.lease_seconds, now), task_id, worker_id)
+
+    def complete(self, task_id, worker_id, summary=None):
+        return self._update_owned("UPDATE tasks SET state = 'done', owner = NULL, summary = ?, updated_at = ?",
+                                  (json.dumps(summary) if summary is not None else None, time.time()),
+                                  task_id, worker_id)
+
+    def release(self, task_id, worker_id, error=None):
+        """Gives the task back (e.g. after an error); it is marked failed once it used MAX_ATTEMPTS leases."""
+        return self._update_owned("""
+            UPDATE tasks SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                             owner = NULL, lease_expires = NULL, last_error = ?, updated_at = ?
+        """, (self.max_attempts, error, time.time()), task_id, worker_id)
+
+    def keep_alive(self, task_id, worker_id, interval=HEARTBEAT_SECONDS):
+        """
+        Heartbeats the lease from a background thread until the returned Event is set.
+        Prints a warning if the lease was lost (the task may then run twice; uploads overwrite).
+        """
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                if not self.heartbeat(task_id, worker_id):
+                    print(f"[WorkQueue] Lost the lease on task {task_id}")
+                    return
+
+        threading.Thread(target=beat, daemon=True).start()
+        return stop
+
+    # ==========================================
+    # 3. STATUS / MAINTENANCE
+    # ==========================================
+
+    def counts(self):
+        """{state: (tasks, rows)}; leases that ran out are shown as 'expired'."""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT CASE WHEN state = 'leased' AND lease_expires < ? THEN 'expired' ELSE state END AS s,
+                       COUNT(*) AS tasks, SUM(size) AS items
+                FROM tasks WHERE queue = ? GROUP BY s
+            """, (time.time(), self.queue)).fetchall()
+        return {row["s"]: (row["tasks"], row["items"]) for row in rows}
+
+    def requeue_failed(self):
+        """Puts failed tasks back with a fresh attempt budget. Returns the number of tasks."""
+        with self._lock:
+            cursor = self.conn.execute("""
+                UPDATE tasks SET state = 'queued', attempts = 0, owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE queue = ? AND state = 'failed'
+            """, (time.time(), self.queue))
+            return cursor.rowcount
+
+
+# ==========================================
+# 4. CLI
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Status and maintenance of the lease-based work queue.")
+    parser.add_argument("--path", default=DEFAULT_QUEUE_PATH)
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_NAME)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="Tasks and rows per state")
+    sub.add_parser("requeue-failed", help="Give failed tasks another MAX_ATTEMPTS leases")
+    args = parser.parse_args()
+
+    with WorkQueue(args.path, args.queue) as work_queue:
+        if args.command == "requeue-failed":
+            print(f"Re-queued {work_queue.requeue_failed()} tasks.")
+        for state, (tasks, items) in sorted(work_queue.counts().items()):
+            print(f"{state:>8}: {tasks} tasks, {items} rows")
+
+if __name__ == "__main__":
+    main()
+
+# python work_queue.py status
+# python work_queue.py --path //nas/migration/work_queue.sqlite requeue-failed